@@ -0,0 +1,233 @@
+"""
+Catalog Scaling Benchmark
+Measures how ObjectRecognizer and FaceRecognizer behave as the catalog grows.
+
+For each catalog size a synthetic catalog is generated in a temp directory
+(random ORB-like binary descriptors for objects, smooth random face crops for
+persons) and the following are measured:
+    objects: startup load, identify, register, delete, resident memory
+    faces:   startup load, match (1 face / batch of 8), register (save sample +
+             append to the model, detection excluded), delete, resident memory
+Results are printed as a scaling table and written to a JSON artifact.
+
+Usage:
+    python benchmark_catalog.py [--objects 5,50,200,500] [--persons 2,10,50]
+                                [--face-image face.jpg] [--out benchmark_catalog.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from face_recognition_module import FaceRecognizer
+from object_recognition_module import ObjectRecognizer
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        # Peak RSS (KB on Linux, bytes on macOS); best effort without psutil
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def timed_ms(fn, *args, repeat=1, **kwargs):
+    """Median wall time of fn(*args) in ms, plus the last return value"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def textured_frame(rng, height=480, width=640):
+    """Random smooth texture that yields plenty of ORB keypoints"""
+    img = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def synthetic_face(rng):
+    """100x100 grayscale blob pattern standing in for a face crop"""
+    img = rng.integers(0, 256, (25, 25), dtype=np.uint8)
+    return cv2.resize(img, (100, 100), interpolation=cv2.INTER_CUBIC)
+
+
+def bench_objects(size, descriptors_per_object, rng, repeat):
+    data_dir = tempfile.mkdtemp(prefix="bench_objects_")
+    try:
+        # Build the catalog on disk the same way the recognizer persists it
+        seed = ObjectRecognizer(data_dir=data_dir)
+        for i in range(size):
+            name = f"object_{i}"
+            desc = rng.integers(0, 256, (descriptors_per_object, 32), dtype=np.uint8)
+            np.save(os.path.join(data_dir, f"{name}_descriptors.npy"), desc)
+            seed.store.set([name], {
+                "keypoints_count": descriptors_per_object,
+                "descriptors_count": descriptors_per_object,
+                "registered_at": datetime.now().isoformat()
+            })
+        seed.store.close()
+        del seed
+
+        rss_before = current_rss_mb()
+        load_ms, recognizer = timed_ms(ObjectRecognizer, data_dir=data_dir)
+        rss_after = current_rss_mb()
+
+        frame = textured_frame(rng)
+        recognizer.identify_objects(frame)  # warm-up (builds prefilter vocabulary)
+        identify_ms, _ = timed_ms(recognizer.identify_objects, frame, repeat=repeat)
+
+        register_ms, _ = timed_ms(recognizer.register_object, textured_frame(rng), "bench_new")
+        delete_ms, _ = timed_ms(recognizer.delete_object, "bench_new")
+
+        recognizer.store.close()
+        return {
+            "size": size,
+            "load_ms": round(load_ms, 2),
+            "identify_ms": round(identify_ms, 2),
+            "register_ms": round(register_ms, 2),
+            "delete_ms": round(delete_ms, 2),
+            "rss_delta_mb": round(rss_after - rss_before, 1)
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_faces(size, samples_per_person, rng, repeat, face_image):
+    data_dir = tempfile.mkdtemp(prefix="bench_faces_")
+    try:
+        seed = FaceRecognizer(data_dir=data_dir)
+        for label in range(size):
+            name = f"person_{label}"
+            sample_dir = os.path.join(data_dir, f"person_{label}")
+            os.makedirs(sample_dir)
+            for s in range(samples_per_person):
+                cv2.imwrite(os.path.join(sample_dir, f"sample_{s}.jpg"), synthetic_face(rng))
+            seed.label_to_name[label] = name
+            seed.persons[name] = {"samples": samples_per_person}
+            seed._save_person(name, label)
+        seed._train_model()
+        seed.store.close()
+        del seed
+
+        rss_before = current_rss_mb()
+        load_ms, recognizer = timed_ms(FaceRecognizer, data_dir=data_dir)
+        rss_after = current_rss_mb()
+
+        crop = synthetic_face(rng)
+        match_ms, _ = timed_ms(recognizer.matcher.predict_batch, [crop], repeat=repeat)
+        batch_ms, _ = timed_ms(recognizer.matcher.predict_batch, [crop] * 8, repeat=repeat)
+
+        # register_face without the cascade (synthetic crops have no detectable
+        # face): save the sample, journal the person, append to the model
+        real_detect = recognizer.detect_faces
+        recognizer.detect_faces = lambda image, **kwargs: ([(0, 0, crop.shape[1], crop.shape[0])], [crop])
+        register_ms, _ = timed_ms(recognizer.register_face, crop, "bench_append", repeat=repeat)
+        recognizer.detect_faces = real_detect
+
+        result = {
+            "size": size,
+            "samples": size * samples_per_person,
+            "load_ms": round(load_ms, 2),
+            "match_ms": round(match_ms, 2),
+            "match8_ms": round(batch_ms, 2),
+            "register_ms": round(register_ms, 2),
+            "rss_delta_mb": round(rss_after - rss_before, 1)
+        }
+
+        if face_image is not None:
+            identify_ms, _ = timed_ms(recognizer.identify_faces, face_image, repeat=repeat)
+            photo_register_ms, _ = timed_ms(recognizer.register_face, face_image, "bench_new")
+            result["identify_ms"] = round(identify_ms, 2)
+            result["photo_register_ms"] = round(photo_register_ms, 2)
+
+        delete_ms, _ = timed_ms(recognizer.delete_person, f"person_{size - 1}")
+        result["delete_ms"] = round(delete_ms, 2)
+
+        recognizer.store.close()
+        return result
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile (p in 0-100) of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def print_table(title, rows):
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    print(f"\n=== {title} ===")
+    print("".join(f"{c:>14}" for c in columns))
+    for row in rows:
+        print("".join(f"{row.get(c, ''):>14}" for c in columns))
+
+
+def parse_sizes(text):
+    return [int(s) for s in text.split(",") if s.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog scaling benchmark")
+    parser.add_argument("--objects", default="5,25,100,250,500", help="Object catalog sizes")
+    parser.add_argument("--descriptors", type=int, default=3000, help="Descriptors per object")
+    parser.add_argument("--persons", default="2,10,25,50", help="Person catalog sizes")
+    parser.add_argument("--samples", type=int, default=10, help="Face samples per person")
+    parser.add_argument("--face-image", help="Photo with a face for identify/register timings")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="benchmark_catalog.json")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    face_image = cv2.imread(args.face_image) if args.face_image else None
+
+    object_rows = [bench_objects(n, args.descriptors, rng, args.repeat) for n in parse_sizes(args.objects)]
+    print_table("ObjectRecognizer", object_rows)
+
+    face_rows = [bench_faces(n, args.samples, rng, args.repeat, face_image) for n in parse_sizes(args.persons)]
+    print_table("FaceRecognizer", face_rows)
+
+    artifact = {
+        "created_at": datetime.now().isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "config": vars(args),
+        "objects": object_rows,
+        "faces": face_rows
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
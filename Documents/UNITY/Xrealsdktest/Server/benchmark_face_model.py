@@ -0,0 +1,132 @@
+"""
+Face Model Persistence Benchmark
+Compares the old face_model.yml (cv2.face LBPH YAML) with the binary
+FaceModelStore (face_model.bin + face_model.json).
+
+For each model size a synthetic model is trained in a temp directory and
+the following are measured:
+    yaml:   load (read + histograms into the matcher), save after a
+            registration (retrain + write), file size
+    binary: one-off migration from the YAML, load (memory-map + matcher),
+            append of one registration, file size
+Results are printed as a table and written to a JSON artifact.
+
+Usage:
+    python benchmark_face_model.py [--samples 100,1000,5000] [--out benchmark_face_model.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from benchmark_catalog import parse_sizes, print_table, synthetic_face, timed_ms
+from face_matcher import LBPHMatcher
+from face_model_store import FaceModelStore
+
+
+def lbph_params(recognizer):
+    return {
+        "radius": recognizer.getRadius(),
+        "neighbors": recognizer.getNeighbors(),
+        "grid_x": recognizer.getGridX(),
+        "grid_y": recognizer.getGridY()
+    }
+
+
+def load_yaml(yaml_path, matcher):
+    """Old startup path: parse the YAML, copy histograms into the matcher"""
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(yaml_path)
+    matcher.set_model(recognizer.getHistograms(), recognizer.getLabels())
+
+
+def load_binary(data_dir, params, matcher):
+    """New startup path: memory-map the records, copy them into the matcher"""
+    store = FaceModelStore(data_dir, params, read_only=True)
+    histograms, labels = store.load()
+    matcher.set_model(histograms, np.array(labels))
+
+
+def bench_size(num_samples, num_persons, rng, repeat):
+    data_dir = tempfile.mkdtemp(prefix="bench_face_model_")
+    try:
+        faces = [synthetic_face(rng) for _ in range(num_samples)]
+        labels = np.arange(num_samples, dtype=np.int32) % num_persons
+
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        params = lbph_params(recognizer)
+        matcher = LBPHMatcher(**params)
+        recognizer.train(faces, labels)
+        yaml_path = os.path.join(data_dir, "face_model.yml")
+        recognizer.write(yaml_path)
+
+        yaml_load_ms, _ = timed_ms(load_yaml, yaml_path, matcher, repeat=repeat)
+
+        # Old registration: retrain on every sample + rewrite the whole YAML
+        new_face = synthetic_face(rng)
+
+        def yaml_register():
+            recognizer.train(faces + [new_face], np.append(labels, 0))
+            recognizer.write(os.path.join(data_dir, "face_model_new.yml"))
+
+        yaml_register_ms, _ = timed_ms(yaml_register)
+
+        store = FaceModelStore(data_dir, params)
+        migrate_ms, _ = timed_ms(store.import_yaml, yaml_path)
+        bin_load_ms, _ = timed_ms(load_binary, data_dir, params, matcher, repeat=repeat)
+
+        # New registration: histogram of the new sample + one record appended
+        def bin_register():
+            store.append(matcher.compute_histograms([new_face]), [0])
+
+        bin_register_ms, _ = timed_ms(bin_register)
+
+        return {
+            "samples": num_samples,
+            "yaml_mb": round(os.path.getsize(yaml_path) / (1024 * 1024), 2),
+            "bin_mb": round(os.path.getsize(store.data_path) / (1024 * 1024), 2),
+            "yaml_load_ms": round(yaml_load_ms, 2),
+            "bin_load_ms": round(bin_load_ms, 2),
+            "migrate_ms": round(migrate_ms, 2),
+            "yaml_reg_ms": round(yaml_register_ms, 2),
+            "bin_reg_ms": round(bin_register_ms, 2)
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face model persistence benchmark")
+    parser.add_argument("--samples", default="100,500,1000,2500", help="Model sizes (enrolled samples)")
+    parser.add_argument("--persons", type=int, default=25, help="Persons the samples are spread over")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="benchmark_face_model.json")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rows = [bench_size(n, args.persons, rng, args.repeat) for n in parse_sizes(args.samples)]
+    print_table("Face model: YAML vs binary", rows)
+
+    artifact = {
+        "created_at": datetime.now().isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "config": vars(args),
+        "results": rows
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
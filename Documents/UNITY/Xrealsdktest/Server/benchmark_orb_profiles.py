@@ -0,0 +1,185 @@
+"""
+ORB Profile Benchmark
+Accuracy versus latency of ORB extraction profiles on a local image set.
+
+Expected layout (one folder per object):
+    dataset/
+        mug/        *.jpg
+        keys/       *.jpg
+        ...
+The first --register images of every folder are registered with the
+'register' profile; the rest are identified with every profile of
+orb_profiles.json plus a sweep of lean /stream variants. Images in
+--negatives (no registered object in view) measure false positives.
+
+Reported per profile: features per query, extraction and total identify
+time (median / p95), top-1 accuracy, recall (the right object among the
+detections) and false positives per image. Results are printed as a table
+and written to a JSON artifact.
+
+Usage:
+    python benchmark_orb_profiles.py dataset/ [--register 3] [--negatives other/]
+                                     [--min-matches 10] [--no-sweep]
+                                     [--out benchmark_orb_profiles.json]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from benchmark_catalog import percentile, print_table
+from object_recognition_module import ObjectRecognizer
+from orb_profiles import DEFAULT_PROFILES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def list_images(folder):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(folder, pattern)))
+    return sorted(paths)
+
+
+def load_dataset(dataset_dir, register_count):
+    """Returns: ({object: [register images]}, [(object, query image)])"""
+    register, queries = {}, []
+    for name in sorted(os.listdir(dataset_dir)):
+        folder = os.path.join(dataset_dir, name)
+        if not os.path.isdir(folder):
+            continue
+        images = [img for img in (cv2.imread(p) for p in list_images(folder)) if img is not None]
+        if len(images) <= register_count:
+            print(f"Skipping '{name}': needs more than {register_count} images")
+            continue
+        register[name] = images[:register_count]
+        queries.extend((name, img) for img in images[register_count:])
+    return register, queries
+
+
+def sweep_profiles(base):
+    """Lean /stream variants around the configured profile"""
+    variants = {}
+    for max_dim in (320, 480, 640):
+        for nfeatures in (300, 500, 1000):
+            profile = dict(base, max_dim=max_dim, nfeatures=nfeatures)
+            variants[f"sweep_{max_dim}_{nfeatures}"] = profile
+    return variants
+
+
+def bench_profile(recognizer, profile_name, queries, negatives, min_matches):
+    extractor = recognizer.orb_profiles.extractor(profile_name)
+    extract_ms, identify_ms, features = [], [], []
+    top1 = recall = 0
+    false_positives = 0
+
+    for truth, image in queries:
+        start = time.perf_counter()
+        keypoints, _ = extractor.extract(image)
+        extract_ms.append((time.perf_counter() - start) * 1000)
+        features.append(len(keypoints))
+
+        start = time.perf_counter()
+        result = recognizer.identify_objects(image, min_matches=min_matches, profile=profile_name)
+        identify_ms.append((time.perf_counter() - start) * 1000)
+
+        names = [obj["name"] for obj in result["objects"]]
+        # Confidence saturates at 1.0, so rank by match count
+        best = max(result["objects"], key=lambda obj: obj["matches"], default=None)
+        top1 += best is not None and best["name"] == truth
+        recall += truth in names
+        false_positives += sum(1 for n in names if n != truth)
+
+    negative_hits = 0
+    for image in negatives:
+        result = recognizer.identify_objects(image, min_matches=min_matches, profile=profile_name)
+        negative_hits += len(result["objects"])
+
+    total_images = len(queries) + len(negatives)
+    return {
+        "profile": profile_name,
+        "features": int(np.mean(features)) if features else 0,
+        "extract_ms": round(float(np.median(extract_ms)), 2),
+        "identify_ms": round(float(np.median(identify_ms)), 2),
+        "identify_p95": round(percentile(identify_ms, 95), 2),
+        "top1": round(top1 / len(queries), 3),
+        "recall": round(recall / len(queries), 3),
+        "fp_per_img": round((false_positives + negative_hits) / total_images, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORB profile accuracy/latency benchmark")
+    parser.add_argument("dataset", help="Folder with one sub-folder of images per object")
+    parser.add_argument("--register", type=int, default=3, help="Images per object used for registration")
+    parser.add_argument("--negatives", help="Folder of images without any registered object")
+    parser.add_argument("--config", default=os.path.join(BASE_DIR, "orb_profiles.json"))
+    parser.add_argument("--min-matches", type=int, default=10, help="Same as /stream (10) by default")
+    parser.add_argument("--no-sweep", action="store_true", help="Only the configured profiles")
+    parser.add_argument("--out", default="benchmark_orb_profiles.json")
+    args = parser.parse_args()
+
+    register, queries = load_dataset(args.dataset, args.register)
+    if not queries:
+        parser.error("No usable object folders in the dataset")
+    negatives = []
+    if args.negatives:
+        negatives = [img for img in (cv2.imread(p) for p in list_images(args.negatives)) if img is not None]
+
+    profiles = dict(DEFAULT_PROFILES)
+    if os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            for name, values in json.load(f).items():
+                profiles[name] = dict(profiles.get(name, DEFAULT_PROFILES["identify"]), **values)
+    if not args.no_sweep:
+        profiles.update(sweep_profiles(profiles["stream"]))
+
+    data_dir = tempfile.mkdtemp(prefix="bench_orb_profiles_")
+    try:
+        config_path = os.path.join(data_dir, "orb_profiles.json")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(profiles, f)
+
+        recognizer = ObjectRecognizer(data_dir=os.path.join(data_dir, "objects"), orb_profiles_path=config_path)
+        start = time.perf_counter()
+        for name, images in register.items():
+            recognizer.add_samples_to_object(images, name)
+        register_ms = (time.perf_counter() - start) * 1000
+        print(f"Registered {len(register)} objects in {register_ms:.0f} ms; "
+              f"{len(queries)} queries, {len(negatives)} negatives")
+
+        rows = [bench_profile(recognizer, name, queries, negatives, args.min_matches)
+                for name in profiles if name != "register"]
+        recognizer.store.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print_table("ORB profiles: accuracy vs latency", rows)
+
+    artifact = {
+        "created_at": datetime.now().isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "config": vars(args),
+        "objects": sorted(register),
+        "profiles": profiles,
+        "results": rows
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
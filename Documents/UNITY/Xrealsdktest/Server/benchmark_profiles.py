@@ -0,0 +1,81 @@
+"""
+Inference Profile Benchmark
+Measures YOLO latency for every profile in inference_profiles.json.
+
+Usage:
+    python benchmark_profiles.py [image_path] [--runs N]
+
+Without an image path a random 1280x720 frame is used.
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from benchmark_catalog import percentile
+from inference_profiles import InferenceProfiles
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def benchmark_profile(model, image, kwargs, runs, warmup=3):
+    """Run model(image, **kwargs) and return latencies in milliseconds"""
+    for _ in range(warmup):
+        model(image, verbose=False, **kwargs)
+
+    latencies = []
+    detections = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        results = model(image, verbose=False, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections = sum(len(r.boxes) for r in results)
+
+    return latencies, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO inference profiles")
+    parser.add_argument("image", nargs="?", help="Image to run inference on")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--config", default=os.path.join(BASE_DIR, "inference_profiles.json"))
+    args = parser.parse_args()
+
+    if args.image:
+        image = cv2.imread(args.image)
+        if image is None:
+            print(f"Could not read image: {args.image}")
+            return
+    else:
+        image = np.random.randint(0, 256, (720, 1280, 3), dtype=np.uint8)
+
+    model = YOLO(args.model)
+    profiles = InferenceProfiles(args.config, model.names)
+
+    # Baseline: all classes at default settings
+    rows = []
+    latencies, detections = benchmark_profile(model, image, {}, args.runs)
+    rows.append(("(baseline)", latencies, detections))
+
+    for name in profiles.list_profiles():
+        kwargs = profiles.model_kwargs(name)
+        if kwargs is None:
+            print(f"Skipping '{name}': none of its classes exist in the model")
+            continue
+        latencies, detections = benchmark_profile(model, image, kwargs, args.runs)
+        rows.append((name, latencies, detections))
+
+    print(f"\n{'profile':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'dets':>6}")
+    for name, latencies, detections in rows:
+        mean = sum(latencies) / len(latencies)
+        print(f"{name:<14}{mean:>10.1f}{percentile(latencies, 50):>10.1f}"
+              f"{percentile(latencies, 95):>10.1f}{detections:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Capture Archive Module
+Packs aged captures from uploads/ into one file per day.
+
+Each day gets YYYYMMDD.pack (concatenated JPEG bytes) and YYYYMMDD.idx
+(one JSON line per capture: name, offset, length). A single capture can be
+read back with one seek + read, and retention drops whole packs instead of
+deleting thousands of small files.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureArchive:
+    def __init__(self, upload_dir, archive_dir, archive_after_hours=1, skip_names=()):
+        self.upload_dir = upload_dir
+        self.archive_dir = archive_dir
+        self.archive_after_hours = archive_after_hours
+        # Working files in uploads/ that must never be archived
+        self.skip_names = set(skip_names)
+
+        if not os.path.exists(archive_dir):
+            os.makedirs(archive_dir)
+
+        # filename -> (day, offset, length)
+        self.index = {}
+        self._lock = threading.Lock()
+
+        self._load_indexes()
+
+    def _pack_path(self, day):
+        return os.path.join(self.archive_dir, f"{day}.pack")
+
+    def _index_path(self, day):
+        return os.path.join(self.archive_dir, f"{day}.idx")
+
+    def _load_indexes(self):
+        """Load every per-day index into memory"""
+        for idx_path in glob.glob(os.path.join(self.archive_dir, "*.idx")):
+            day = os.path.basename(idx_path)[:-len(".idx")]
+            with open(idx_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line: the capture is still in uploads/
+                    self.index[entry["name"]] = (day, entry["offset"], entry["length"])
+
+        if self.index:
+            logger.info("Archived captures loaded", extra={"fields": {"captures": len(self.index)}})
+
+    @staticmethod
+    def _capture_day(filepath):
+        """Day of a capture: YYYYMMDD prefix of the filename, else its mtime"""
+        prefix = os.path.basename(filepath)[:8]
+        if len(prefix) == 8 and prefix.isdigit():
+            return prefix
+        return datetime.fromtimestamp(os.path.getmtime(filepath)).strftime("%Y%m%d")
+
+    def archive_old_captures(self):
+        """
+        Move captures older than archive_after_hours into their day pack.
+        Returns: number of archived captures
+        """
+        cutoff = time.time() - self.archive_after_hours * 3600
+        archived = 0
+
+        with self._lock:
+            for filepath in glob.glob(os.path.join(self.upload_dir, "*.jpg")):
+                name = os.path.basename(filepath)
+                if name in self.skip_names:
+                    continue
+                try:
+                    if os.path.getmtime(filepath) > cutoff:
+                        continue
+
+                    if name not in self.index:
+                        day = self._capture_day(filepath)
+                        with open(filepath, 'rb') as src:
+                            data = src.read()
+
+                        # Data first, then the index line: a crash in between
+                        # leaves unreferenced bytes, never a dangling entry
+                        with open(self._pack_path(day), 'ab') as pack:
+                            offset = pack.tell()
+                            pack.write(data)
+                            pack.flush()
+                            os.fsync(pack.fileno())
+                        with open(self._index_path(day), 'a', encoding='utf-8') as idx:
+                            idx.write(json.dumps({"name": name, "offset": offset, "length": len(data)},
+                                                 ensure_ascii=False) + "\n")
+
+                        self.index[name] = (day, offset, len(data))
+                        archived += 1
+
+                    os.remove(filepath)
+                except Exception as e:
+                    logger.warning("Could not archive capture", extra={"fields": {"file": name, "error": str(e)}})
+
+        return archived
+
+    def read(self, filename):
+        """Read one archived capture (None if not archived)"""
+        entry = self.index.get(filename)
+        if entry is None:
+            return None
+
+        day, offset, length = entry
+        try:
+            with open(self._pack_path(day), 'rb') as pack:
+                pack.seek(offset)
+                return pack.read(length)
+        except FileNotFoundError:
+            return None  # pack dropped by retention in the meantime
+
+    def list_names(self):
+        """Filenames of all archived captures"""
+        return list(self.index.keys())
+
+    def drop_old_packs(self, max_age_hours):
+        """
+        Delete whole day packs whose every capture is older than max_age_hours.
+        Returns: list of dropped days
+        """
+        cutoff = datetime.now() - timedelta(hours=max_age_hours)
+        dropped = []
+
+        with self._lock:
+            for pack_path in glob.glob(os.path.join(self.archive_dir, "*.pack")):
+                day = os.path.basename(pack_path)[:-len(".pack")]
+                try:
+                    day_end = datetime.strptime(day, "%Y%m%d") + timedelta(days=1)
+                except ValueError:
+                    continue
+                if day_end > cutoff:
+                    continue
+
+                os.remove(pack_path)
+                if os.path.exists(self._index_path(day)):
+                    os.remove(self._index_path(day))
+                self.index = {n: e for n, e in self.index.items() if e[0] != day}
+                dropped.append(day)
+
+        return dropped
+
+    def get_stats(self):
+        """Pack count, archived capture count and bytes on disk"""
+        packs = glob.glob(os.path.join(self.archive_dir, "*.pack"))
+        return {
+            "packs": len(packs),
+            "captures": len(self.index),
+            "bytes": sum(os.path.getsize(p) for p in packs)
+        }
@@ -0,0 +1,201 @@
+"""
+Capture Storage Module
+Save-time encoding policy for /stream captures.
+
+Most captures are only ever shown as gallery entries, so by default they
+are downscaled to max_dim and re-encoded at a lower JPEG quality on a
+background thread. The request only enqueues the decoded frame and is
+not slowed down. Frames with a detection from a keep_full_sources source
+(registered custom objects, faces) are written at full quality right away.
+
+Only the final file is written: there is no full-size write followed by a
+rewrite. A capture whose encode is still pending can be waited for with
+wait(). When the queue is full the frame is encoded in the request thread
+instead of being dropped.
+
+Per-day counters (upload bytes in, bytes written, encode time) are kept
+for /storage/stats, next to the on-disk footprint per day.
+"""
+
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureStorage:
+    def __init__(self, upload_dir, max_dim=1280, quality=75, full_quality=90,
+                 keep_full_sources=("custom", "face"), queue_size=32, enabled=True):
+        self.upload_dir = upload_dir
+        self.max_dim = max_dim
+        self.quality = quality
+        # Quality for raw frames kept at full quality (JPEG uploads are kept as received)
+        self.full_quality = full_quality
+        self.keep_full_sources = set(keep_full_sources)
+        self.enabled = enabled
+
+        # filename -> threading.Event set once the file is on disk
+        self._pending = {}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+
+        # day (YYYYMMDD) -> counters
+        self._days = {}
+        self.inline_encodes = 0
+
+        self._closed = False
+        self._worker = threading.Thread(target=self._encode_loop, daemon=True)
+        self._worker.start()
+
+    # ---------- policy ----------
+
+    def keeps_full_quality(self, detections):
+        return any(det.get("source") in self.keep_full_sources for det in detections)
+
+    def save(self, filename, frame, detections):
+        """
+        Store one capture (frame_decoding.Frame) according to the policy.
+        Returns: "full" or "reduced" (the tier the capture is stored in)
+        """
+        if not self.enabled or self.keeps_full_quality(detections):
+            start = time.perf_counter()
+            data = frame.jpeg_bytes(self.full_quality)
+            self._write(filename, data)
+            self._account(filename, len(frame.data), len(data), (time.perf_counter() - start) * 1000, "full")
+            return "full"
+
+        done = threading.Event()
+        with self._lock:
+            self._pending[filename] = done
+        try:
+            self._queue.put_nowait((filename, frame, done))
+        except queue.Full:
+            # Keep the capture, at the cost of encoding in this request
+            with self._lock:
+                self.inline_encodes += 1
+            self._encode(filename, frame, done)
+        return "reduced"
+
+    # ---------- encoding ----------
+
+    def _reduced_jpeg(self, frame):
+        """Downscaled, lower-quality JPEG (the upload itself if that is smaller)"""
+        image = frame.image
+        height, width = image.shape[:2]
+        if self.max_dim and max(height, width) > self.max_dim:
+            scale = self.max_dim / float(max(height, width))
+            image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+
+        ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return frame.jpeg_bytes(self.full_quality)
+        data = buf.tobytes()
+        if frame.is_encoded and frame.format in ("jpeg", "jpg") and len(frame.data) <= len(data):
+            return frame.data
+        return data
+
+    def _encode(self, filename, frame, done):
+        start = time.perf_counter()
+        try:
+            data = self._reduced_jpeg(frame)
+            self._write(filename, data)
+            self._account(filename, len(frame.data), len(data), (time.perf_counter() - start) * 1000, "reduced")
+        except Exception as e:
+            logger.warning("Could not store capture", extra={"fields": {"file": filename, "error": str(e)}})
+        finally:
+            with self._lock:
+                self._pending.pop(filename, None)
+            done.set()
+
+    def _encode_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._encode(*item)
+
+    def _write(self, filename, data):
+        # Write under a temporary name so /uploads never serves a partial file
+        path = os.path.join(self.upload_dir, filename)
+        tmp = path + ".part"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def wait(self, filename, timeout=5.0):
+        """Block until a pending capture is written (True if it is not pending anymore)"""
+        with self._lock:
+            done = self._pending.get(filename)
+        return done is None or done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """Finish queued encodes (called at shutdown)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    # ---------- stats ----------
+
+    def _account(self, filename, bytes_in, bytes_written, encode_ms, tier):
+        day = filename[:8] if filename[:8].isdigit() else time.strftime("%Y%m%d")
+        with self._lock:
+            stats = self._days.get(day)
+            if stats is None:
+                stats = self._days[day] = {
+                    "captures": 0, "full": 0, "reduced": 0,
+                    "bytes_in": 0, "bytes_written": 0, "encode_ms": 0.0
+                }
+            stats["captures"] += 1
+            stats[tier] += 1
+            stats["bytes_in"] += bytes_in
+            stats["bytes_written"] += bytes_written
+            stats["encode_ms"] += encode_ms
+
+    def disk_footprint(self):
+        """Bytes and file count of uploads/ per capture day"""
+        days = {}
+        for path in glob.glob(os.path.join(self.upload_dir, "*.jpg")):
+            name = os.path.basename(path)
+            if not name[:8].isdigit():
+                continue
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue  # archived meanwhile
+            entry = days.setdefault(name[:8], {"files": 0, "bytes": 0})
+            entry["files"] += 1
+            entry["bytes"] += size
+        return days
+
+    def get_stats(self):
+        with self._lock:
+            days = {day: dict(stats) for day, stats in self._days.items()}
+            pending = len(self._pending)
+            inline = self.inline_encodes
+
+        for stats in days.values():
+            stats["encode_ms"] = round(stats["encode_ms"], 1)
+            stats["avg_encode_ms"] = round(stats["encode_ms"] / stats["captures"], 2) if stats["captures"] else 0.0
+            stats["write_ratio"] = round(stats["bytes_written"] / stats["bytes_in"], 3) if stats["bytes_in"] else None
+
+        return {
+            "policy": {
+                "enabled": self.enabled,
+                "max_dim": self.max_dim,
+                "quality": self.quality,
+                "keep_full_sources": sorted(self.keep_full_sources)
+            },
+            "pending": pending,
+            "inline_encodes": inline,
+            "days": days,
+            "disk": self.disk_footprint()
+        }
@@ -0,0 +1,199 @@
+"""
+Face Matcher Module
+Vectorised LBPH matching engine.
+
+Reproduces OpenCV's LBPHFaceRecognizer (circular LBP with bilinear
+interpolation, per-cell normalised spatial histograms, chi-square "alt"
+distance, nearest sample wins) but keeps every enrolled histogram in one
+NumPy matrix and scores all faces of a frame in a single batched distance
+computation, followed by a per-person top-1 reduction.
+
+The chi-square "alt" distance is evaluated as
+    2 * sum((q - s)^2 / (q + s)) = 2 * (sum(q) + sum(s) - 4 * sum(q*s / (q + s)))
+where the last sum only has non-zero terms where both histograms are
+non-zero, so only the query's non-zero bins are gathered from the matrix.
+The matrix is kept bin-major (D, N) so that gather reads contiguous rows.
+"""
+
+import math
+import threading
+
+import numpy as np
+
+FLOAT_EPSILON = np.finfo(np.float32).eps
+
+
+class LBPHMatcher:
+    def __init__(self, radius=1, neighbors=8, grid_x=8, grid_y=8, block_elements=4 * 1024 * 1024):
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.num_patterns = 2 ** neighbors
+        # Upper bound on samples * gathered bins held in memory per block
+        self.block_elements = block_elements
+
+        # (bin-major histograms (D, N) float32, per-sample sums (N,) float64,
+        #  labels (N,) int32), swapped atomically
+        self._model = (np.zeros((0, 0), dtype=np.float32), np.zeros(0), np.zeros(0, dtype=np.int32))
+        # Backing arrays of _model with spare columns for append(); _model holds
+        # views of the first N, so readers never see columns being filled in
+        self._buffers = self._model
+        self._lock = threading.Lock()
+
+        self._sampling_points = self._compute_sampling_points()
+
+    def _compute_sampling_points(self):
+        """Neighbour offsets and bilinear weights, in float32 like OpenCV"""
+        points = []
+        for n in range(self.neighbors):
+            # Angle in double precision, position rounded to float (as in elbp_)
+            angle = 2.0 * math.pi * n / float(self.neighbors)
+            x = np.float32(self.radius * math.cos(angle))
+            y = np.float32(-self.radius * math.sin(angle))
+            fx, fy = int(np.floor(x)), int(np.floor(y))
+            cx, cy = int(np.ceil(x)), int(np.ceil(y))
+            ty = np.float32(y - fy)
+            tx = np.float32(x - fx)
+            one = np.float32(1)
+            weights = ((one - tx) * (one - ty), tx * (one - ty), (one - tx) * ty, tx * ty)
+            points.append((fx, fy, cx, cy, weights))
+        return points
+
+    @property
+    def size(self):
+        return len(self._model[2])
+
+    def set_model(self, histograms, labels):
+        """
+        Replace the enrolled samples.
+        histograms: (N, D) float32 (or list of (1, D)), labels: (N,) ints
+        """
+        histograms = np.asarray(np.vstack(histograms) if len(histograms) else np.zeros((0, 0)), dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        sums = histograms.sum(axis=1, dtype=np.float64)
+        by_bin = np.ascontiguousarray(histograms.T)
+        with self._lock:
+            self._model = (by_bin, sums, labels)
+            self._buffers = self._model
+
+    def append(self, histograms, labels):
+        """
+        Enroll more samples without rebuilding the model (amortised O(new samples)).
+        histograms: (M, D) float32 (or list of (1, D)), labels: (M,) ints
+        """
+        histograms = np.asarray(np.vstack(histograms), dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        if len(labels) == 0:
+            return
+
+        with self._lock:
+            by_bin, sums, all_labels = self._buffers
+            count = len(self._model[2])
+            total = count + len(labels)
+            dim = histograms.shape[1]
+            if count and by_bin.shape[0] != dim:
+                raise ValueError(f"Histogram size {dim} does not match the model ({by_bin.shape[0]})")
+
+            if total > len(all_labels) or by_bin.shape[0] != dim:
+                # Grow geometrically so repeated registrations stay cheap
+                capacity = max(total, 2 * len(all_labels), 64)
+                grown = (np.empty((dim, capacity), dtype=np.float32),
+                         np.empty(capacity, dtype=np.float64),
+                         np.empty(capacity, dtype=np.int32))
+                if count:
+                    grown[0][:, :count] = by_bin[:, :count]
+                    grown[1][:count] = sums[:count]
+                    grown[2][:count] = all_labels[:count]
+                by_bin, sums, all_labels = self._buffers = grown
+
+            by_bin[:, count:total] = histograms.T
+            sums[count:total] = histograms.sum(axis=1, dtype=np.float64)
+            all_labels[count:total] = labels
+            self._model = (by_bin[:, :total], sums[:total], all_labels[:total])
+
+    def lbp_image(self, face_img):
+        """Circular LBP codes of a grayscale image (OpenCV elbp)"""
+        src = face_img.astype(np.float32)
+        r = self.radius
+        rows, cols = src.shape
+        center = src[r:rows - r, r:cols - r]
+        codes = np.zeros(center.shape, dtype=np.int32)
+
+        def shifted(dy, dx):
+            return src[r + dy:rows - r + dy, r + dx:cols - r + dx]
+
+        for n, (fx, fy, cx, cy, (w1, w2, w3, w4)) in enumerate(self._sampling_points):
+            t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+            bit = (t > center) | (np.abs(t - center) < FLOAT_EPSILON)
+            codes += bit.astype(np.int32) << n
+        return codes
+
+    def compute_histogram(self, face_img):
+        """Normalised spatial LBP histogram, (D,) float32"""
+        codes = self.lbp_image(face_img)
+        height = codes.shape[0] // self.grid_y
+        width = codes.shape[1] // self.grid_x
+
+        # Crop to whole cells, then give every cell its own bin range
+        cells = codes[:height * self.grid_y, :width * self.grid_x]
+        cells = cells.reshape(self.grid_y, height, self.grid_x, width).transpose(0, 2, 1, 3)
+        cells = cells.reshape(self.grid_y * self.grid_x, height * width)
+        offsets = (np.arange(len(cells)) * self.num_patterns)[:, None]
+
+        counts = np.bincount((cells + offsets).ravel(), minlength=len(cells) * self.num_patterns)
+        return counts.astype(np.float32) / np.float32(height * width)
+
+    def compute_histograms(self, face_imgs):
+        return np.vstack([self.compute_histogram(img) for img in face_imgs])
+
+    def distances(self, queries, model=None):
+        """
+        Chi-square (alt) distance between every query and every sample.
+        queries: (Q, D) float32; Returns: (Q, N) float64
+        """
+        by_bin, sums, _ = model if model is not None else self._model
+        num_samples = len(sums)
+        result = np.empty((len(queries), num_samples), dtype=np.float64)
+        if num_samples == 0:
+            return result
+
+        for q, query in enumerate(queries):
+            bins = np.flatnonzero(query)
+            values = query[bins][:, None]
+            cross = np.empty(num_samples, dtype=np.float64)
+
+            block = max(1, self.block_elements // max(1, len(bins)))
+            for start in range(0, num_samples, block):
+                samples = by_bin[bins, start:start + block]
+                denom = samples + values
+                np.multiply(samples, values, out=samples)
+                np.divide(samples, denom, out=samples)
+                cross[start:start + block] = samples.sum(axis=0, dtype=np.float64)
+
+            result[q] = 2.0 * (query.sum(dtype=np.float64) + sums - 4.0 * cross)
+        return result
+
+    def predict_batch(self, face_imgs):
+        """
+        Nearest enrolled person for every face.
+        Returns: list of (label, distance); label is -1 if nothing is enrolled
+        """
+        if len(face_imgs) == 0:
+            return []
+
+        model = self._model
+        labels = model[2]
+        if len(labels) == 0:
+            return [(-1, float("inf")) for _ in face_imgs]
+
+        dist = self.distances(self.compute_histograms(face_imgs), model)
+
+        # Per-person top-1: minimum distance over each person's samples
+        person_labels, inverse = np.unique(labels, return_inverse=True)
+        per_person = np.full((len(dist), len(person_labels)), np.inf)
+        for q in range(len(dist)):
+            np.minimum.at(per_person[q], inverse, dist[q])
+
+        best = per_person.argmin(axis=1)
+        return [(int(person_labels[b]), float(per_person[q, b])) for q, b in enumerate(best)]
@@ -0,0 +1,184 @@
+"""
+Face Model Store Module
+Binary persistence for the LBPH face model (replaces face_model.yml).
+
+face_model.bin holds one fixed-size record per enrolled sample:
+    int32 label + D float32 histogram bins
+so the file can be memory-mapped at startup and new samples are appended
+without rewriting the existing ones. face_model.json holds the record
+count and the LBPH parameters; it is replaced atomically after the
+records are on disk, so a torn append is simply ignored on the next load.
+Deleting a person compacts the file into a new one (os.replace).
+
+The old YAML written by cv2.face LBPHFaceRecognizer can be imported once
+with import_yaml().
+"""
+
+import json
+import logging
+import os
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+DATA_NAME = "face_model.bin"
+META_NAME = "face_model.json"
+
+
+class FaceModelStore:
+    def __init__(self, data_dir, params, read_only=False):
+        """params: {"radius", "neighbors", "grid_x", "grid_y"} of the LBPH model"""
+        self.data_dir = data_dir
+        self.params = dict(params)
+        self.read_only = read_only
+        self.data_path = os.path.join(data_dir, DATA_NAME)
+        self.meta_path = os.path.join(data_dir, META_NAME)
+
+        self.dim = None
+        self.count = 0
+        self.meta = self._read_meta()
+        if self.meta is not None:
+            self.dim = self.meta["dim"]
+            self.count = self.meta["count"]
+
+    @property
+    def exists(self):
+        return self.meta is not None
+
+    def _read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Unreadable face model metadata", extra={"fields": {"file": META_NAME, "error": str(e)}})
+            return None
+        if meta.get("format") != FORMAT_VERSION or meta.get("params") != self.params:
+            # Written by another version / other LBPH settings: rebuild from samples
+            logger.warning("Face model metadata does not match the current LBPH settings",
+                           extra={"fields": {"file": META_NAME}})
+            return None
+        return meta
+
+    def _write_meta(self):
+        meta = {"format": FORMAT_VERSION, "params": self.params, "dim": self.dim, "count": self.count}
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.meta_path)
+        self.meta = meta
+
+    def _record_dtype(self, dim=None):
+        return np.dtype([("label", "<i4"), ("hist", "<f4", (dim or self.dim,))])
+
+    def _records(self, histograms, labels):
+        histograms = np.asarray(histograms, dtype=np.float32).reshape(len(labels), -1)
+        records = np.empty(len(labels), dtype=self._record_dtype(histograms.shape[1]))
+        records["label"] = labels
+        records["hist"] = histograms
+        return records
+
+    # ---------- reading ----------
+
+    def load(self):
+        """
+        Memory-map the committed records.
+        Returns: (histograms (N, D) float32 view, labels (N,) int32 view);
+        copy what must outlive a later append / compaction
+        (the map keeps the file open on Windows)
+        """
+        if not self.exists or self.count == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32), np.zeros(0, dtype=np.int32)
+
+        record_dtype = self._record_dtype()
+        available = os.path.getsize(self.data_path) // record_dtype.itemsize
+        if available < self.count:
+            raise ValueError(f"{DATA_NAME} has {available} records, {META_NAME} expects {self.count}")
+
+        records = np.memmap(self.data_path, dtype=record_dtype, mode='r', shape=(self.count,))
+        return records["hist"], records["label"]
+
+    # ---------- writing ----------
+
+    def append(self, histograms, labels):
+        """Append samples (N, D) with their labels; committed by the metadata update"""
+        if self.read_only:
+            raise RuntimeError("FaceModelStore is read-only")
+        if len(labels) == 0:
+            return
+        histograms = np.asarray(histograms, dtype=np.float32)
+        if self.dim is None or self.count == 0:
+            self.dim = histograms.shape[1]
+        elif histograms.shape[1] != self.dim:
+            raise ValueError(f"Histogram size {histograms.shape[1]} != stored {self.dim}")
+
+        records = self._records(histograms, labels)
+        mode = 'r+b' if os.path.exists(self.data_path) else 'wb'
+        with open(self.data_path, mode) as f:
+            # Drop records of an interrupted append before writing
+            f.truncate(self.count * records.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.count += len(labels)
+        self._write_meta()
+
+    def replace(self, histograms, labels):
+        """Rewrite the whole model (retrain / compaction)"""
+        if self.read_only:
+            raise RuntimeError("FaceModelStore is read-only")
+        histograms = np.asarray(histograms, dtype=np.float32)
+        if len(labels):
+            self.dim = histograms.shape[1]
+
+        tmp = self.data_path + ".tmp"
+        with open(tmp, 'wb') as f:
+            if len(labels):
+                f.write(self._records(histograms, labels).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.data_path)
+
+        self.count = len(labels)
+        self._write_meta()
+
+    def remove_labels(self, labels):
+        """Drop every sample of the given labels (compacts the file)"""
+        histograms, stored_labels = self.load()
+        keep = ~np.isin(stored_labels, list(labels))
+        # Copy out of the map and release it before the file is replaced
+        kept_histograms, kept_labels = np.array(histograms[keep]), np.array(stored_labels[keep])
+        del histograms, stored_labels
+        self.replace(kept_histograms, kept_labels)
+
+    # ---------- migration ----------
+
+    def import_yaml(self, yaml_path):
+        """
+        Import a face_model.yml written by cv2.face LBPHFaceRecognizer.
+        Returns: number of imported samples
+        """
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(yaml_path)
+        yaml_params = {
+            "radius": recognizer.getRadius(),
+            "neighbors": recognizer.getNeighbors(),
+            "grid_x": recognizer.getGridX(),
+            "grid_y": recognizer.getGridY()
+        }
+        if yaml_params != self.params:
+            raise ValueError(f"YAML model uses LBPH settings {yaml_params}, expected {self.params}")
+
+        histograms = recognizer.getHistograms()
+        labels = np.asarray(recognizer.getLabels(), dtype=np.int32).reshape(-1)
+        histograms = np.vstack(histograms) if len(histograms) else np.zeros((0, 0), dtype=np.float32)
+        self.replace(histograms, labels)
+        return len(labels)
@@ -1,17 +1,25 @@
 """
 Face Recognition Module
 Uses OpenCV's LBPH (Local Binary Patterns Histograms) for face recognition.
+Histograms are computed by the vectorised LBPHMatcher (same values as
+cv2.face) and persisted in the binary FaceModelStore, so a registration only
+appends the new samples; all faces of a frame are scored in one batch.
 """
 
 import cv2
 import numpy as np
 import os
-import json
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from face_matcher import LBPHMatcher
+from face_model_store import FaceModelStore
+from metadata_store import JournaledStore
 
 class FaceRecognizer:
-    def __init__(self, data_dir="face_data"):
+    def __init__(self, data_dir="face_data", read_only=False):
         self.data_dir = data_dir
+        # Read-only instances (inference workers) load the model but never write it
+        self.read_only = read_only
         self.faces_json = os.path.join(data_dir, "faces.json")
         
         # Create data directory if not exists
@@ -19,46 +27,96 @@ class FaceRecognizer:
             os.makedirs(data_dir)
         
         # Load Haar cascade for face detection (built into OpenCV)
-        cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
+        self.cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.face_cascade = cv2.CascadeClassifier(self.cascade_path)
+        
+        # Per-thread cascades for batch enrollment workers
+        self._thread_local = threading.local()
         
         # LBPH Face Recognizer
         self.recognizer = cv2.face.LBPHFaceRecognizer_create()
         
+        # Batched matcher mirroring the trained LBPH histograms
+        self.matcher = LBPHMatcher(
+            radius=self.recognizer.getRadius(),
+            neighbors=self.recognizer.getNeighbors(),
+            grid_x=self.recognizer.getGridX(),
+            grid_y=self.recognizer.getGridY()
+        )
+        
+        # Binary histogram + label records (face_model.bin)
+        self.model_store = FaceModelStore(data_dir, {
+            "radius": self.matcher.radius,
+            "neighbors": self.matcher.neighbors,
+            "grid_x": self.matcher.grid_x,
+            "grid_y": self.matcher.grid_y
+        }, read_only=read_only)
+        
         # Person data: {id: {"name": "Name", "samples": count}}
         self.persons = {}
         self.label_to_name = {}
         
+        # Catalog version: bumped on every register/delete so callers
+        # can tell when previously computed results are stale
+        self.version = 0
+        
         # Load existing data
         self._load_data()
     
     def _load_data(self):
-        """Load saved face data"""
-        if os.path.exists(self.faces_json):
-            with open(self.faces_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.persons = data.get('persons', {})
-                self.label_to_name = {int(k): v for k, v in data.get('label_to_name', {}).items()}
-        
-        # Load trained model if exists
-        model_path = os.path.join(self.data_dir, "face_model.yml")
-        if os.path.exists(model_path):
-            try:
-                self.recognizer.read(model_path)
+        """Load saved face data (faces.json snapshot + journal)"""
+        self.store = JournaledStore(self.faces_json, read_only=self.read_only)
+        # Working copies; changes are journaled through _save_person
+        self.persons = self.store.get(['persons'], {})
+        self.label_to_name = {int(k): v for k, v in self.store.get(['label_to_name'], {}).items()}
+        
+        # Load trained model: binary store, else migrate the old YAML, else rebuild from samples
+        yaml_path = os.path.join(self.data_dir, "face_model.yml")
+        try:
+            if self.model_store.exists:
+                self._sync_matcher()
                 print(f"[FaceRecognizer] Loaded model with {len(self.persons)} persons")
-            except Exception as e:
-                print(f"[FaceRecognizer] Could not load model: {e}")
+            elif os.path.exists(yaml_path) and not self.read_only:
+                count = self.model_store.import_yaml(yaml_path)
+                self._sync_matcher()
+                print(f"[FaceRecognizer] Migrated {os.path.basename(yaml_path)} ({count} samples) to binary model")
+            elif os.path.exists(yaml_path):
+                self.recognizer.read(yaml_path)
+                self.matcher.set_model(self.recognizer.getHistograms(), self.recognizer.getLabels())
+            elif self.label_to_name and not self.read_only:
+                self._train_model()
+        except Exception as e:
+            print(f"[FaceRecognizer] Could not load model: {e}")
     
-    def _save_data(self):
-        """Save face data"""
-        data = {
-            'persons': self.persons,
-            'label_to_name': {str(k): v for k, v in self.label_to_name.items()}
-        }
-        with open(self.faces_json, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def _sync_matcher(self):
+        """Copy the stored histograms into the batched matcher"""
+        histograms, labels = self.model_store.load()
+        self.matcher.set_model(histograms, np.array(labels))
     
-    def detect_faces(self, image):
+    def _add_samples(self, sample_paths, label):
+        """
+        Append the histograms of newly saved samples to the model.
+        Samples are read back from disk so they match a full retrain (JPEG round trip).
+        """
+        face_imgs = [cv2.imread(path, cv2.IMREAD_GRAYSCALE) for path in sample_paths]
+        face_imgs = [img for img in face_imgs if img is not None]
+        if not face_imgs:
+            return
+        histograms = self.matcher.compute_histograms(face_imgs)
+        labels = [label] * len(face_imgs)
+        self.model_store.append(histograms, labels)
+        self.matcher.append(histograms, labels)
+    
+    def _save_person(self, name, label):
+        """Journal the metadata change for one person"""
+        if name in self.persons:
+            self.store.set(['persons', name], self.persons[name])
+            self.store.set(['label_to_name', str(label)], name)
+        else:
+            self.store.delete(['persons', name])
+            self.store.delete(['label_to_name', str(label)])
+    
+    def detect_faces(self, image, cascade=None):
         """
         Detect faces in an image.
         Returns: list of (x, y, w, h) tuples and grayscale face images
@@ -66,12 +124,15 @@ class FaceRecognizer:
         if image is None:
             return [], []
         
+        if cascade is None:
+            cascade = self.face_cascade
+        
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         # CLAHE for better contrast
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
         gray = clahe.apply(gray)
         
-        faces = self.face_cascade.detectMultiScale(
+        faces = cascade.detectMultiScale(
             gray,
             scaleFactor=1.05,  # より細かいスケール（感度アップ）
             minNeighbors=3,    # 検出しやすく（3が一般的）
@@ -99,30 +160,12 @@ class FaceRecognizer:
             return {"success": False, "message": "No face detected"}
         
         # 複数の顔が検出された場合は最大の顔を選択
+        face_img = self._select_largest_face(faces, face_images)
         if len(faces) > 1:
-            # 顔のサイズ（面積）で最大のものを選択
-            largest_idx = 0
-            largest_area = 0
-            for idx, (x, y, w, h) in enumerate(faces):
-                area = w * h
-                if area > largest_area:
-                    largest_area = area
-                    largest_idx = idx
-            face_images = [face_images[largest_idx]]
-            faces = [faces[largest_idx]]
             print(f"[FaceRecognizer] Multiple faces detected, using largest one")
         
         # Get or create label for this person
-        label = None
-        for lbl, n in self.label_to_name.items():
-            if n == name:
-                label = lbl
-                break
-        
-        if label is None:
-            label = len(self.label_to_name)
-            self.label_to_name[label] = name
-            self.persons[name] = {"samples": 0}
+        label = self._get_or_create_label(name)
         
         # Save face sample
         sample_dir = os.path.join(self.data_dir, f"person_{label}")
@@ -131,21 +174,122 @@ class FaceRecognizer:
         
         sample_count = self.persons[name]["samples"]
         sample_path = os.path.join(sample_dir, f"sample_{sample_count}.jpg")
-        cv2.imwrite(sample_path, face_images[0])
+        cv2.imwrite(sample_path, face_img)
         
         self.persons[name]["samples"] = sample_count + 1
-        self._save_data()
+        self._save_person(name, label)
         
-        # Retrain model
-        self._train_model()
+        # Add the new sample to the model
+        self._add_samples([sample_path], label)
+        self.version += 1
         
         return {
             "success": True, 
             "message": f"Registered face for '{name}' (sample #{sample_count + 1})"
         }
     
+    def _select_largest_face(self, faces, face_images):
+        """Pick the face crop with the largest bounding box area"""
+        largest_idx = 0
+        largest_area = 0
+        for idx, (x, y, w, h) in enumerate(faces):
+            area = w * h
+            if area > largest_area:
+                largest_area = area
+                largest_idx = idx
+        return face_images[largest_idx]
+    
+    def _get_or_create_label(self, name):
+        """Get the label for a person, creating a new one if needed"""
+        for lbl, n in self.label_to_name.items():
+            if n == name:
+                return lbl
+        
+        label = len(self.label_to_name)
+        self.label_to_name[label] = name
+        self.persons[name] = {"samples": 0}
+        return label
+    
+    def _detect_enrollment_face(self, image):
+        """
+        Detect and crop the enrollment face for one image (runs on worker threads).
+        Returns: (face_img or None, reason)
+        """
+        if image is None:
+            return None, "Invalid image"
+        
+        cascade = getattr(self._thread_local, "cascade", None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(self.cascade_path)
+            self._thread_local.cascade = cascade
+        
+        faces, face_images = self.detect_faces(image, cascade=cascade)
+        if len(faces) == 0:
+            return None, "No face detected"
+        
+        return self._select_largest_face(faces, face_images), "OK"
+    
+    def register_faces(self, images, name, max_workers=4):
+        """
+        Register many face images for one person in a single batch.
+        Faces are detected in parallel; metadata is saved and the new
+        samples are appended to the model once for the whole batch.
+        Returns: {"success": True/False, "message": "...", "registered": N,
+                  "rejected": [{"index": i, "reason": "..."}]}
+        """
+        if not name:
+            return {"success": False, "message": "No name provided", "registered": 0, "rejected": []}
+        
+        if not images:
+            return {"success": False, "message": "No images provided", "registered": 0, "rejected": []}
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            detected = list(executor.map(self._detect_enrollment_face, images))
+        
+        rejected = [
+            {"index": idx, "reason": reason}
+            for idx, (face_img, reason) in enumerate(detected)
+            if face_img is None
+        ]
+        accepted = [face_img for face_img, _ in detected if face_img is not None]
+        
+        if not accepted:
+            return {
+                "success": False,
+                "message": "No face detected in any image",
+                "registered": 0,
+                "rejected": rejected
+            }
+        
+        label = self._get_or_create_label(name)
+        
+        sample_dir = os.path.join(self.data_dir, f"person_{label}")
+        if not os.path.exists(sample_dir):
+            os.makedirs(sample_dir)
+        
+        sample_count = self.persons[name]["samples"]
+        sample_paths = []
+        for offset, face_img in enumerate(accepted):
+            sample_path = os.path.join(sample_dir, f"sample_{sample_count + offset}.jpg")
+            cv2.imwrite(sample_path, face_img)
+            sample_paths.append(sample_path)
+        
+        self.persons[name]["samples"] = sample_count + len(accepted)
+        self._save_person(name, label)
+        
+        # One model append for the whole batch
+        self._add_samples(sample_paths, label)
+        self.version += 1
+        
+        return {
+            "success": True,
+            "message": f"Registered {len(accepted)}/{len(images)} faces for '{name}' (total samples: {sample_count + len(accepted)})",
+            "registered": len(accepted),
+            "rejected": rejected
+        }
+    
     def _train_model(self):
-        """Train the LBPH model with all saved faces"""
+        """Rebuild the model from all saved face samples"""
         faces = []
         labels = []
         
@@ -163,9 +307,8 @@ class FaceRecognizer:
                         labels.append(label)
         
         if len(faces) > 0:
-            self.recognizer.train(faces, np.array(labels))
-            model_path = os.path.join(self.data_dir, "face_model.yml")
-            self.recognizer.write(model_path)
+            self.model_store.replace(self.matcher.compute_histograms(faces), labels)
+            self._sync_matcher()
             print(f"[FaceRecognizer] Trained model with {len(faces)} samples from {len(self.label_to_name)} persons")
     
     def identify_faces(self, image):
@@ -182,34 +325,31 @@ class FaceRecognizer:
             # No trained faces yet
             return [{"name": "Unknown", "confidence": 0.0, "bbox": list(map(int, face))} for face in faces]
         
+        # Score every face of the frame in one batch
+        try:
+            predictions = self.matcher.predict_batch(face_images)
+        except Exception as e:
+            print(f"[FaceRecognizer] Error identifying faces: {e}")
+            predictions = [(-1, float("inf"))] * len(face_images)
+        
         results = []
-        for i, (face_bbox, face_img) in enumerate(zip(faces, face_images)):
-            try:
-                label, confidence = self.recognizer.predict(face_img)
-                
-                # LBPH confidence is distance (lower = better)
-                # Convert to 0-1 scale (higher = better)
-                # Typical threshold is around 50-80
-                confidence_normalized = max(0, (100 - confidence) / 100)
-                
-                if confidence < 70 and label in self.label_to_name:
-                    name = self.label_to_name[label]
-                else:
-                    name = "Unknown"
-                    confidence_normalized = 0.0
-                
-                results.append({
-                    "name": name,
-                    "confidence": round(confidence_normalized, 2),
-                    "bbox": list(map(int, face_bbox))
-                })
-            except Exception as e:
-                print(f"[FaceRecognizer] Error identifying face: {e}")
-                results.append({
-                    "name": "Unknown",
-                    "confidence": 0.0,
-                    "bbox": list(map(int, face_bbox))
-                })
+        for face_bbox, (label, confidence) in zip(faces, predictions):
+            # LBPH confidence is distance (lower = better)
+            # Convert to 0-1 scale (higher = better)
+            # Typical threshold is around 50-80
+            confidence_normalized = max(0, (100 - confidence) / 100)
+            
+            if confidence < 70 and label in self.label_to_name:
+                name = self.label_to_name[label]
+            else:
+                name = "Unknown"
+                confidence_normalized = 0.0
+            
+            results.append({
+                "name": name,
+                "confidence": round(confidence_normalized, 2),
+                "bbox": list(map(int, face_bbox))
+            })
         
         return results
     
@@ -242,11 +382,12 @@ class FaceRecognizer:
         if name in self.persons:
             del self.persons[name]
         
-        self._save_data()
+        self._save_person(name, label)
         
-        # Retrain model
-        if len(self.label_to_name) > 0:
-            self._train_model()
+        # Drop the person's samples from the model
+        self.model_store.remove_labels([label])
+        self._sync_matcher()
+        self.version += 1
         
         return {"success": True, "message": f"Deleted person '{name}'"}
 
@@ -0,0 +1,196 @@
+"""
+Frame Decoding Module
+Turns an upload into a BGR NumPy image for /stream and the identify endpoints.
+
+Besides JPEG/PNG files, clients can send raw pixel buffers to skip the
+JPEG encode (client) / decode (server) round trip:
+    multipart: file 'image' + form fields format, width, height[, stride, flip]
+    raw body:  Content-Type application/octet-stream + headers
+               X-Frame-Format, X-Frame-Width, X-Frame-Height
+               [, X-Frame-Stride, X-Frame-Flip]
+Formats: bgr, rgb, bgra, rgba, gray, nv12, nv21, i420. stride is the row
+pitch in bytes (of the Y plane for YUV formats). flip=1 flips rows, for
+bottom-up buffers such as Unity's Texture2D.GetRawTextureData().
+
+Raw buffers are wrapped with np.frombuffer/as_strided (no copy); a colour
+conversion only happens when the format is not already BGR, and JPEG
+encoding only happens when a frame is actually saved.
+"""
+
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# Packed formats: channels and the conversion to BGR (None = already BGR)
+PACKED_FORMATS = {
+    "bgr": (3, None),
+    "rgb": (3, cv2.COLOR_RGB2BGR),
+    "bgra": (4, cv2.COLOR_BGRA2BGR),
+    "rgba": (4, cv2.COLOR_RGBA2BGR),
+    "gray": (1, cv2.COLOR_GRAY2BGR),
+}
+
+# 4:2:0 formats: (rows of height * 3 / 2) -> BGR
+YUV_FORMATS = {
+    "nv12": cv2.COLOR_YUV2BGR_NV12,
+    "nv21": cv2.COLOR_YUV2BGR_NV21,
+    "i420": cv2.COLOR_YUV2BGR_I420,
+}
+
+ENCODED_FORMATS = ("jpeg", "jpg", "png")
+
+
+class FrameFormatError(ValueError):
+    """The upload does not describe a valid frame"""
+
+
+def wrap_raw_frame(data, fmt, width, height, stride=None):
+    """
+    Zero-copy (read-only) view of a raw pixel buffer.
+    Packed formats -> (H, W, C) or (H, W); YUV formats -> (H * 3 / 2, W)
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if width <= 0 or height <= 0:
+        raise FrameFormatError("width and height must be positive")
+
+    if fmt in PACKED_FORMATS:
+        channels = PACKED_FORMATS[fmt][0]
+        row_bytes = width * channels
+        stride = stride or row_bytes
+        if stride < row_bytes:
+            raise FrameFormatError(f"stride {stride} is smaller than a {width}px {fmt} row")
+        needed = stride * (height - 1) + row_bytes
+        if buf.size < needed:
+            raise FrameFormatError(f"{fmt} {width}x{height} needs {needed} bytes, got {buf.size}")
+
+        if channels == 1:
+            return as_strided(buf, shape=(height, width), strides=(stride, 1), writeable=False)
+        return as_strided(buf, shape=(height, width, channels), strides=(stride, channels, 1), writeable=False)
+
+    if fmt in YUV_FORMATS:
+        if width % 2 or height % 2:
+            raise FrameFormatError(f"{fmt} needs even width and height")
+        stride = stride or width
+        if fmt == "i420" and stride != width:
+            raise FrameFormatError("i420 frames must be tightly packed (stride == width)")
+        if stride < width:
+            raise FrameFormatError(f"stride {stride} is smaller than width {width}")
+        rows = height * 3 // 2  # Y rows, then interleaved UV rows (same pitch)
+        needed = stride * (rows - 1) + width
+        if buf.size < needed:
+            raise FrameFormatError(f"{fmt} {width}x{height} needs {needed} bytes, got {buf.size}")
+        return as_strided(buf, shape=(rows, width), strides=(stride, 1), writeable=False)
+
+    raise FrameFormatError(f"Unsupported frame format: {fmt}")
+
+
+def raw_to_bgr(frame, fmt, flip=False):
+    """BGR image for a wrapped raw frame; no copy for tightly packed, unflipped BGR"""
+    if fmt in YUV_FORMATS:
+        # cvtColor needs the planes contiguous (copies only when stride padding exists)
+        bgr = cv2.cvtColor(np.ascontiguousarray(frame), YUV_FORMATS[fmt])
+        return cv2.flip(bgr, 0) if flip else bgr
+
+    if flip:
+        frame = frame[::-1]
+    code = PACKED_FORMATS[fmt][1]
+    if code is None:
+        return np.ascontiguousarray(frame)
+    return cv2.cvtColor(np.ascontiguousarray(frame), code)
+
+
+class Frame:
+    """An uploaded frame; the BGR image is decoded/converted on first access"""
+    def __init__(self, data, fmt="jpeg", width=None, height=None, stride=None, flip=False):
+        # Bytes as received (hashed for result cache keys)
+        self.data = data
+        self.format = (fmt or "jpeg").lower()
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self.flip = flip
+        self._image = None
+
+    @property
+    def image(self):
+        """
+        BGR image for inference.
+        Raises: FrameFormatError if the bytes do not match the declared layout
+        """
+        if self._image is None:
+            self._image = self._decode()
+        return self._image
+
+    def _decode(self):
+        if self.is_encoded:
+            image = cv2.imdecode(np.frombuffer(self.data, np.uint8), cv2.IMREAD_COLOR) if self.data else None
+            if image is None:
+                raise FrameFormatError("Could not read image")
+            return image
+
+        if self.width is None or self.height is None:
+            raise FrameFormatError(f"Raw {self.format} frames need width and height")
+        frame = wrap_raw_frame(self.data, self.format, self.width, self.height, self.stride)
+        return raw_to_bgr(frame, self.format, self.flip)
+
+    @property
+    def is_encoded(self):
+        return self.format in ENCODED_FORMATS
+
+    @property
+    def cache_tag(self):
+        """Layout part of a result cache key (same bytes, other layout = other frame)"""
+        if self.is_encoded:
+            return "encoded"
+        return f"{self.format}:{self.width}x{self.height}:{self.stride}:{int(self.flip)}"
+
+    def jpeg_bytes(self, quality=90):
+        """JPEG for saving: the uploaded bytes for JPEG uploads, otherwise encoded now"""
+        if self.format in ("jpeg", "jpg"):
+            return self.data
+        ok, buf = cv2.imencode(".jpg", self.image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise FrameFormatError("Could not encode frame as JPEG")
+        return buf.tobytes()
+
+
+def _int_field(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise FrameFormatError(f"{name} must be an integer")
+
+
+def read_frame(req, field="image"):
+    """
+    Read the frame of a Flask request (multipart file or raw body).
+    Returns: Frame (not decoded yet), or None if the request carries no frame
+    Raises: FrameFormatError for malformed layout fields
+    """
+    if field in req.files:
+        file = req.files[field]
+        if file.filename == '':
+            return None
+        meta = req.form
+        data = file.read()
+        fmt = meta.get("format", "jpeg")
+        width = _int_field(meta.get("width"), "width")
+        height = _int_field(meta.get("height"), "height")
+        stride = _int_field(meta.get("stride"), "stride")
+        flip = meta.get("flip") == "1"
+    elif req.mimetype == "application/octet-stream":
+        data = req.get_data(cache=False)
+        if not data:
+            return None
+        headers = req.headers
+        fmt = headers.get("X-Frame-Format", "jpeg")
+        width = _int_field(headers.get("X-Frame-Width"), "X-Frame-Width")
+        height = _int_field(headers.get("X-Frame-Height"), "X-Frame-Height")
+        stride = _int_field(headers.get("X-Frame-Stride"), "X-Frame-Stride")
+        flip = headers.get("X-Frame-Flip") == "1"
+    else:
+        return None
+
+    return Frame(data, fmt, width, height, stride, flip)
@@ -0,0 +1,184 @@
+"""
+Frame Tracker Module
+Per-client multi-object tracking for /stream save suppression.
+
+Detections are associated with existing tracks of the same class by IoU
+(ByteTrack-style: confident detections are matched first, the remaining
+ones can only extend tracks, never start them). A track that has not been
+seen for max_missed_seconds ends, so an object that leaves and comes back
+is a new track.
+
+A frame is worth saving only when something changed for that client:
+    new_track     an object appeared
+    scene_change  the inferred scene differs from the last saved frame
+    keepalive     nothing changed, but keepalive_seconds passed since the last save
+Everything else is suppressed (inference results are still returned).
+"""
+
+import itertools
+import threading
+import time
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU between every box in a (N, 4) and b (M, 4), [x1, y1, x2, y2]"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, name, box, now):
+        self.track_id = track_id
+        self.name = name
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+
+
+class ClientTracks:
+    """Tracks and save state of one client (headset)"""
+    def __init__(self):
+        self.tracks = []
+        self.last_saved_at = None
+        self.last_saved_scene = None
+        self.last_seen = 0.0
+
+
+class StreamTracker:
+    def __init__(self, iou_threshold=0.3, high_confidence=0.5, max_missed_seconds=3.0,
+                 keepalive_seconds=60.0, client_ttl_seconds=600.0):
+        self.iou_threshold = iou_threshold
+        # Detections below this can extend a track but not start one
+        self.high_confidence = high_confidence
+        self.max_missed_seconds = max_missed_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.client_ttl_seconds = client_ttl_seconds
+
+        self._clients = {}
+        self._track_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.saved = 0
+        self.suppressed = 0
+        self.save_reasons = {"new_track": 0, "scene_change": 0, "keepalive": 0}
+
+    def _associate(self, client, detections, now):
+        """
+        Match detections to tracks; start tracks for unmatched confident ones.
+        Returns: (track id per detection, ids of new tracks)
+        """
+        client.tracks = [t for t in client.tracks if now - t.last_seen <= self.max_missed_seconds]
+
+        track_ids = [None] * len(detections)
+        new_ids = []
+        matched_tracks = set()
+
+        high = [i for i, d in enumerate(detections) if d["confidence"] >= self.high_confidence]
+        low = [i for i, d in enumerate(detections) if d["confidence"] < self.high_confidence]
+
+        for stage in (high, low):
+            for name in set(detections[i]["name"] for i in stage):
+                det_idx = [i for i in stage if detections[i]["name"] == name]
+                tracks = [t for t in client.tracks if t.name == name and t.track_id not in matched_tracks]
+                if not tracks:
+                    continue
+
+                ious = iou_matrix([t.box for t in tracks], [detections[i]["box"] for i in det_idx])
+                # Greedy assignment, best overlap first
+                pairs = np.argwhere(ious >= self.iou_threshold)
+                order = np.argsort(-ious[pairs[:, 0], pairs[:, 1]]) if len(pairs) else []
+                used_dets = set()
+                for k in order:
+                    ti, di = pairs[k]
+                    track = tracks[ti]
+                    if track.track_id in matched_tracks or di in used_dets:
+                        continue
+                    matched_tracks.add(track.track_id)
+                    used_dets.add(di)
+                    track.box = detections[det_idx[di]]["box"]
+                    track.last_seen = now
+                    track.hits += 1
+                    track_ids[det_idx[di]] = track.track_id
+
+        for i in high:
+            if track_ids[i] is None:
+                track = Track(next(self._track_ids), detections[i]["name"], detections[i]["box"], now)
+                client.tracks.append(track)
+                track_ids[i] = track.track_id
+                new_ids.append(track.track_id)
+
+        return track_ids, new_ids
+
+    def observe(self, client_id, detections, scene, now=None):
+        """
+        Update the client's tracks with one frame's detections
+        ({"name", "confidence", "box"} dicts) and decide whether to save it.
+        Returns: {"save": bool, "reason": str or None, "track_ids": [...], "new_tracks": [...]}
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            client = self._clients.get(client_id)
+            if client is None:
+                client = self._clients[client_id] = ClientTracks()
+            client.last_seen = now
+
+            track_ids, new_ids = self._associate(client, detections, now)
+
+            if new_ids:
+                reason = "new_track"
+            elif scene != client.last_saved_scene:
+                reason = "scene_change"
+            elif client.last_saved_at is None or now - client.last_saved_at >= self.keepalive_seconds:
+                reason = "keepalive"
+            else:
+                reason = None
+
+            if reason is not None:
+                client.last_saved_at = now
+                client.last_saved_scene = scene
+                self.saved += 1
+                self.save_reasons[reason] += 1
+            else:
+                self.suppressed += 1
+
+            self._drop_idle_clients(now)
+
+        return {"save": reason is not None, "reason": reason, "track_ids": track_ids, "new_tracks": new_ids}
+
+    def _drop_idle_clients(self, now):
+        idle = [cid for cid, c in self._clients.items() if now - c.last_seen > self.client_ttl_seconds]
+        for cid in idle:
+            del self._clients[cid]
+
+    def get_stats(self):
+        now = time.time()
+        with self._lock:
+            total = self.saved + self.suppressed
+            return {
+                "saved": self.saved,
+                "suppressed": self.suppressed,
+                "suppression_rate": round(self.suppressed / total, 4) if total else 0.0,
+                "save_reasons": dict(self.save_reasons),
+                "clients": {
+                    cid: {
+                        "active_tracks": sum(1 for t in c.tracks if now - t.last_seen <= self.max_missed_seconds),
+                        "last_saved_scene": c.last_saved_scene
+                    }
+                    for cid, c in self._clients.items()
+                }
+            }
@@ -0,0 +1,171 @@
+"""
+Inference Context Module
+The models and recognizers one process uses for inference, plus the
+per-request inference routines (/stream, /objects/identify, /identify_faces).
+
+The server builds one context in-process; every InferencePool worker builds
+its own (read-only recognizers) from the same picklable config, so both paths
+run exactly the same code.
+"""
+
+import logging
+
+from face_recognition_module import FaceRecognizer
+from inference_profiles import InferenceProfiles
+from latency_budget import LatencyBudget
+from object_recognition_module import ObjectRecognizer
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceContext:
+    def __init__(self, model, inference_profiles, object_recognizer, face_recognizer, config=None):
+        self.model = model
+        self.inference_profiles = inference_profiles
+        self.object_recognizer = object_recognizer
+        self.face_recognizer = face_recognizer
+        # Needed to rebuild recognizers in worker processes
+        self.config = config
+        # Recent cost of custom-object matching (decides whether it fits a budget)
+        self.custom_ms_avg = 0.0
+
+    def run_yolo(self, image, profile, **kwargs):
+        """
+        Run YOLO with an inference profile.
+        Returns: list of (name, confidence, [x1, y1, x2, y2] normalized)
+        """
+        profile_kwargs = self.inference_profiles.model_kwargs(profile)
+        if profile_kwargs is None:
+            # Misconfigured class list: detect nothing rather than every class
+            return []
+        results = self.model(image, **kwargs, **profile_kwargs)
+
+        detections = []
+        for r in results:
+            for box in r.boxes:
+                cls_id = int(box.cls[0])
+                detections.append((self.model.names[cls_id], float(box.conf[0]), box.xyxyn[0].tolist()))
+        return detections
+
+    def detect_stream(self, image, budget_ms=None):
+        """
+        YOLO ('stream' profile) + registered custom objects for one frame.
+        budget_ms: time left for this frame; custom-object matching is
+        optional and is skipped or cut short when the budget runs out.
+        Returns: (detailed_objects, detected_names, stages)
+        """
+        budget = LatencyBudget(budget_ms)
+        detailed_objects = []
+        detected_names = []
+
+        # 'stream' profile: conf=0.6 by default for precision (reduce false positives)
+        with budget.stage("yolo"):
+            for name, conf, xyxyn in self.run_yolo(image, 'stream', verbose=False):
+                detailed_objects.append({
+                    "name": name,
+                    "confidence": round(conf, 2),
+                    "box": xyxyn,
+                    "source": "yolo"
+                })
+                detected_names.append(name)
+
+        if not budget.allows(self.custom_ms_avg):
+            budget.skip("custom_objects")
+            # Decay the estimate so one slow frame does not disable matching for good
+            self.custom_ms_avg *= 0.9
+            return detailed_objects, detected_names, budget.stages
+
+        # Check custom registered objects (lower matches for streaming)
+        with budget.stage("custom_objects") as stage:
+            custom_result = self.object_recognizer.identify_objects(
+                image, min_matches=10, deadline=budget.deadline, profile="stream")
+            if custom_result.get("truncated"):
+                stage["status"] = "truncated"
+        if stage["status"] == "ran":
+            self.custom_ms_avg = 0.8 * self.custom_ms_avg + 0.2 * stage["ms"]
+
+        if custom_result["success"] and len(custom_result["objects"]) > 0:
+            for obj in custom_result["objects"]:
+                custom_name = obj["name"]
+                custom_conf = float(obj["confidence"])
+
+                # Prevent duplicates if YOLO also found it
+                if custom_name not in detected_names:
+                    detailed_objects.append({
+                        "name": custom_name,
+                        "confidence": custom_conf,
+                        "box": [0.4, 0.4, 0.6, 0.6],  # Dummy center box
+                        "source": "custom"
+                    })
+                    detected_names.append(custom_name)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Custom object found", extra={"fields": {"name": custom_name, "confidence": custom_conf}})
+
+        return detailed_objects, detected_names, budget.stages
+
+    def identify_objects(self, image):
+        """Registered objects + common YOLO classes ('identify' profile)"""
+        result = self.object_recognizer.identify_objects(image)
+
+        try:
+            yolo_found = []
+            for name, conf, xyxyn in self.run_yolo(image, 'identify', verbose=False):
+                result['objects'].append({
+                    "name": name,
+                    "confidence": round(conf, 2),
+                    "matches": 999,
+                    "box": xyxyn
+                })
+                yolo_found.append(name)
+
+            # Sort combined results by confidence
+            result['objects'].sort(key=lambda x: x['confidence'], reverse=True)
+            if yolo_found:
+                result['message'] += f" (+{len(yolo_found)} common items)"
+
+        except Exception:
+            logger.exception("YOLO identify failed")
+
+        return result
+
+    def identify_faces(self, image):
+        return self.face_recognizer.identify_faces(image)
+
+    def reload_objects(self):
+        """Re-read the object catalog written by the main process"""
+        self.object_recognizer.store.close()
+        self.object_recognizer = ObjectRecognizer(
+            data_dir=self.config["object_data_dir"],
+            prefilter_top_k=self.config["prefilter_top_k"],
+            read_only=True,
+            orb_profiles_path=self.config["orb_profiles_path"]
+        )
+
+    def reload_faces(self):
+        """Re-read the face model written by the main process"""
+        self.face_recognizer.store.close()
+        self.face_recognizer = FaceRecognizer(data_dir=self.config["face_data_dir"], read_only=True)
+
+
+def load_model(config):
+    """YOLO (or the stub model) as selected by the config"""
+    if config["stub_models"]:
+        from stub_models import StubYOLO
+        return StubYOLO()
+
+    from ultralytics import YOLO
+    return YOLO(config["model_path"])
+
+
+def build_context(config):
+    """Context with read-only recognizers, for worker processes"""
+    model = load_model(config)
+    return InferenceContext(
+        model,
+        InferenceProfiles(config["profiles_path"], model.names),
+        ObjectRecognizer(data_dir=config["object_data_dir"],
+                         prefilter_top_k=config["prefilter_top_k"], read_only=True,
+                         orb_profiles_path=config["orb_profiles_path"]),
+        FaceRecognizer(data_dir=config["face_data_dir"], read_only=True),
+        config=config
+    )
@@ -0,0 +1,393 @@
+"""
+Inference Pool Module
+Process pool running YOLO + recognizer inference outside the Flask process.
+
+Each worker process holds its own InferenceContext (model, inference
+profiles, read-only recognizers), so concurrent frames are no longer
+serialised by the GIL or a single shared model.
+
+Decoded frames are handed over through preallocated
+multiprocessing.shared_memory slots (only shape/dtype/slot index are sent),
+and results come back as small dicts on one result queue. Catalog changes
+made by the main process are published as generation counters; a worker
+reloads the affected recognizer before its next task. A monitor thread
+restarts dead workers and kills workers stuck on a task longer than the
+task timeout, failing their in-flight tasks with InferencePoolError.
+"""
+
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Catalog generation slots shared with the workers
+CATALOGS = ("objects", "faces")
+
+# Environment read by BLAS / OpenMP runtimes at import time in the worker
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+# Serialises process start-up (see _start_process)
+_start_lock = threading.Lock()
+
+
+class InferencePoolError(Exception):
+    """A task could not be run by the pool (no slot, worker died, timeout)"""
+
+
+def _limit_threads(threads):
+    import cv2
+    cv2.setNumThreads(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _worker_main(worker_id, config, threads, slot_names, task_queue, result_queue, generations):
+    """Worker process entry point"""
+    from inference_context import build_context
+    from structured_logging import setup_logging
+
+    setup_logging(config.get("log_level", "INFO"))
+    context = build_context(config)
+    _limit_threads(threads)  # after the model import so torch is covered too
+
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    seen = list(generations[:])
+    reloaders = {"objects": context.reload_objects, "faces": context.reload_faces}
+
+    result_queue.put(("ready", worker_id, None, True, os.getpid()))
+    parent = mp.parent_process()
+
+    while True:
+        try:
+            task = task_queue.get(timeout=1.0)
+        except queue.Empty:
+            # Exit with the server even if it was killed without close()
+            if parent is not None and not parent.is_alive():
+                break
+            continue
+        if task is None:
+            break
+        task_id, kind, slot, shape, dtype, kwargs = task
+
+        # Pick up catalog changes made by the main process
+        current = list(generations[:])
+        for idx, catalog in enumerate(CATALOGS):
+            if current[idx] != seen[idx]:
+                reloaders[catalog]()
+        seen = current
+
+        image = np.ndarray(shape, dtype=dtype, buffer=slots[slot].buf)
+        try:
+            result = getattr(context, kind)(image, **kwargs)
+            message = ("done", worker_id, task_id, True, result)
+        except Exception as e:
+            message = ("done", worker_id, task_id, False, f"{type(e).__name__}: {e}")
+        del image  # release the buffer export before the slot can be reused
+
+        result_queue.put(message)
+
+    for shm in slots:
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.process = None
+        self.task_queue = None
+        self.ready = False
+        # Set while the monitor reaps and respawns the process (outside the lock)
+        self.restarting = False
+        # task_id -> (future, slot, submitted_at)
+        self.in_flight = {}
+        self.restarts = 0
+        self.completed = 0
+
+
+class InferencePool:
+    def __init__(self, worker_config, num_workers=2, threads_per_worker=1,
+                 max_frame_bytes=1920 * 1080 * 4, slots_per_worker=2,
+                 task_timeout=30.0, restart_workers=True, health_interval=1.0):
+        self.worker_config = worker_config
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.max_frame_bytes = max_frame_bytes
+        self.task_timeout = task_timeout
+        self.restart_workers = restart_workers
+        self.health_interval = health_interval
+
+        # spawn: a fresh interpreter per worker (same on Windows and Linux,
+        # and no forked copies of the server's threads or CUDA state)
+        self._ctx = mp.get_context("spawn")
+        self._result_queue = self._ctx.Queue()
+        self._generations = self._ctx.Array("q", len(CATALOGS))
+
+        self._slots = [
+            shared_memory.SharedMemory(create=True, size=max_frame_bytes)
+            for _ in range(num_workers * slots_per_worker)
+        ]
+        self._free_slots = queue.Queue()
+        for idx in range(len(self._slots)):
+            self._free_slots.put(idx)
+
+        self._workers = [_Worker(i) for i in range(num_workers)]
+        self._task_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+        self.failed_tasks = 0
+        self.timed_out_tasks = 0
+
+        for worker in self._workers:
+            self._start_worker(worker)
+
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self._collector.start()
+        self._monitor = threading.Thread(target=self._monitor_workers, daemon=True)
+        self._monitor.start()
+
+    # ---------- worker lifecycle ----------
+
+    def _spawn(self, worker_id):
+        """Start a worker process. Returns: (process, task_queue)"""
+        task_queue = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.worker_config, self.threads_per_worker,
+                  [shm.name for shm in self._slots], task_queue,
+                  self._result_queue, self._generations),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        self._start_process(process)
+        return process, task_queue
+
+    def _start_worker(self, worker):
+        worker.ready = False
+        worker.process, worker.task_queue = self._spawn(worker.worker_id)
+
+    def _start_process(self, process):
+        """
+        Start a spawn process without re-running the server script in it.
+        spawn normally re-executes the parent's __main__ file in the child;
+        server.py loads models and starts threads at import time, so the
+        main module's __file__ is hidden while the child is prepared.
+        Thread-limit env vars are set for the child the same way.
+        """
+        threads = str(self.threads_per_worker)
+        with _start_lock:
+            main_module = sys.modules["__main__"]
+            main_file = getattr(main_module, "__file__", None)
+            saved_env = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+            try:
+                if main_file is not None:
+                    del main_module.__file__
+                for name in THREAD_ENV_VARS:
+                    os.environ[name] = threads
+                process.start()
+            finally:
+                if main_file is not None:
+                    main_module.__file__ = main_file
+                for name, value in saved_env.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+
+    def _fail_in_flight(self, worker, reason):
+        """Fail every task assigned to a worker (caller holds the lock)"""
+        for task_id, (future, slot, _) in worker.in_flight.items():
+            self._free_slots.put(slot)
+            self.failed_tasks += 1
+            if not future.done():
+                future.set_exception(InferencePoolError(reason))
+        worker.in_flight.clear()
+
+    def _monitor_workers(self):
+        """
+        Restart stuck or dead workers. Only the bookkeeping runs under the
+        lock; terminating, joining and spawning (model load included) happen
+        outside it so submit() keeps serving the other workers meanwhile.
+        """
+        while not self._closed.wait(self.health_interval):
+            now = time.time()
+            stuck, dead = [], []
+            with self._lock:
+                for worker in self._workers:
+                    if worker.restarting:
+                        continue
+                    if any(now - submitted > self.task_timeout
+                           for _, _, submitted in worker.in_flight.values()) and worker.process.is_alive():
+                        stuck.append(worker)
+                    elif not worker.process.is_alive():
+                        dead.append(worker)
+                    else:
+                        continue
+                    # Not selectable by submit() until the replacement is ready
+                    worker.restarting = True
+                    worker.ready = False
+
+            for worker in stuck:
+                logger.warning("Worker exceeded task timeout, restarting", extra={"fields": {
+                    "worker": worker.worker_id, "timeout": self.task_timeout}})
+                worker.process.terminate()
+                worker.process.join(timeout=5)
+
+            for worker in stuck + dead:
+                worker.process.join(timeout=1)
+                with self._lock:
+                    if worker in stuck:
+                        self.timed_out_tasks += 1
+                    self._fail_in_flight(worker, f"Inference worker {worker.worker_id} stopped")
+
+                if not self.restart_workers or self._closed.is_set():
+                    continue
+                logger.warning("Worker exited, restarting", extra={"fields": {
+                    "worker": worker.worker_id, "exitcode": worker.process.exitcode}})
+                process, task_queue = self._spawn(worker.worker_id)
+                with self._lock:
+                    worker.process, worker.task_queue = process, task_queue
+                    worker.restarts += 1
+                    worker.restarting = False
+
+    def _collect_results(self):
+        while not self._closed.is_set():
+            try:
+                kind, worker_id, task_id, ok, payload = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            with self._lock:
+                worker = self._workers[worker_id]
+                if kind == "ready":
+                    worker.ready = True
+                    logger.info("Worker ready", extra={"fields": {"worker": worker_id, "pid": payload}})
+                    continue
+
+                entry = worker.in_flight.pop(task_id, None)
+                if entry is None:
+                    continue  # already failed by the monitor
+                future, slot, _ = entry
+                self._free_slots.put(slot)
+                worker.completed += 1
+                if not ok:
+                    self.failed_tasks += 1
+
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(InferencePoolError(payload))
+
+    # ---------- public API ----------
+
+    @property
+    def ready_workers(self):
+        return sum(1 for w in self._workers if w.ready and w.process.is_alive())
+
+    def submit(self, kind, image, slot_timeout=5.0, **kwargs):
+        """
+        Queue an inference task ('detect_stream', 'identify_objects',
+        'identify_faces') on the least loaded ready worker.
+        Returns: concurrent.futures.Future with the routine's return value
+        """
+        if self._closed.is_set():
+            raise InferencePoolError("Inference pool is closed")
+
+        image = np.ascontiguousarray(image)
+        if image.nbytes > self.max_frame_bytes:
+            raise InferencePoolError(f"Frame of {image.nbytes} bytes exceeds the {self.max_frame_bytes} byte slot")
+
+        try:
+            slot = self._free_slots.get(timeout=slot_timeout)
+        except queue.Empty:
+            raise InferencePoolError("No free frame slot (pool saturated)")
+
+        view = np.ndarray(image.shape, dtype=image.dtype, buffer=self._slots[slot].buf)
+        view[...] = image
+        del view
+
+        future = Future()
+        with self._lock:
+            candidates = [w for w in self._workers if w.ready and w.process.is_alive()]
+            if not candidates:
+                self._free_slots.put(slot)
+                raise InferencePoolError("No inference worker is ready")
+
+            worker = min(candidates, key=lambda w: len(w.in_flight))
+            task_id = next(self._task_ids)
+            worker.in_flight[task_id] = (future, slot, time.time())
+            worker.task_queue.put((task_id, kind, slot, image.shape, image.dtype.str, kwargs))
+
+        return future
+
+    def run(self, kind, image, timeout=None, **kwargs):
+        """Blocking submit(); raises InferencePoolError on failure or timeout"""
+        future = self.submit(kind, image, **kwargs)
+        try:
+            return future.result(timeout=timeout if timeout is not None else self.task_timeout)
+        except FutureTimeoutError:
+            raise InferencePoolError(f"Inference '{kind}' timed out")
+
+    def notify_catalog_changed(self, catalog):
+        """Tell workers to reload 'objects' or 'faces' before their next task"""
+        idx = CATALOGS.index(catalog)
+        with self._generations.get_lock():
+            self._generations[idx] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "workers": [
+                    {
+                        "id": w.worker_id,
+                        "pid": w.process.pid,
+                        "alive": w.process.is_alive(),
+                        "ready": w.ready,
+                        "in_flight": len(w.in_flight),
+                        "completed": w.completed,
+                        "restarts": w.restarts
+                    }
+                    for w in self._workers
+                ],
+                "threads_per_worker": self.threads_per_worker,
+                "free_slots": self._free_slots.qsize(),
+                "total_slots": len(self._slots),
+                "failed_tasks": self.failed_tasks,
+                "timed_out_tasks": self.timed_out_tasks,
+                "catalog_generations": dict(zip(CATALOGS, self._generations[:]))
+            }
+
+    def close(self):
+        """Stop workers and release the shared memory slots"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._monitor.join(timeout=self.health_interval * 2)
+
+        with self._lock:
+            for worker in self._workers:
+                if worker.process.is_alive():
+                    worker.task_queue.put(None)
+            for worker in self._workers:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+                self._fail_in_flight(worker, "Inference pool closed")
+
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
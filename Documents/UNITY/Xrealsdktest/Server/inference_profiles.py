@@ -0,0 +1,129 @@
+"""
+Inference Profiles Module
+Per-endpoint YOLO settings (class subset, input size, thresholds, max detections).
+Profiles are read from inference_profiles.json and passed straight into the
+model call, so filtering happens inside YOLO instead of in Python afterwards.
+The file is re-read automatically when it changes on disk; a file that
+cannot be parsed keeps the previous profiles (none, i.e. defaults, at startup).
+"""
+
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Used when the config file is missing or a profile leaves a key out
+DEFAULT_PROFILE = {
+    "classes": None,   # None = all classes
+    "imgsz": 640,
+    "conf": 0.5,
+    "iou": 0.7,
+    "max_det": 100
+}
+
+
+class InferenceProfiles:
+    def __init__(self, config_path, class_names):
+        """
+        config_path: path to inference_profiles.json
+        class_names: model.names ({class_id: name})
+        """
+        self.config_path = config_path
+        self.name_to_id = {name: int(cls_id) for cls_id, name in class_names.items()}
+
+        self.profiles = {}
+        # Profiles that name classes of which none exist in the model
+        self.unresolved = set()
+        self._mtime = None
+        # Bumped on every (re)load so cached results can be invalidated
+        self._version = 0
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        """Load (or reload) profiles from the config file"""
+        profiles = {}
+        mtime = None
+
+        if os.path.exists(self.config_path):
+            mtime = os.path.getmtime(self.config_path)
+            try:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+                for name, values in raw.items():
+                    profile = dict(DEFAULT_PROFILE)
+                    profile.update(values)
+                    profiles[name] = profile
+            except Exception as e:
+                logger.error("Could not load inference profiles", extra={"fields": {"path": self.config_path, "error": str(e)}})
+                # Keep the previous profiles and don't re-read the file until it changes again
+                self._mtime = mtime
+                return
+
+        unresolved = set()
+        for name, profile in profiles.items():
+            if not profile.get("classes"):
+                continue
+            unknown = [c for c in profile["classes"] if c not in self.name_to_id]
+            if len(unknown) == len(profile["classes"]):
+                unresolved.add(name)
+                logger.error("Profile has no known classes, it will detect nothing",
+                             extra={"fields": {"profile": name, "classes": unknown}})
+            elif unknown:
+                logger.warning("Profile names unknown classes",
+                               extra={"fields": {"profile": name, "classes": unknown}})
+
+        self.profiles = profiles
+        self.unresolved = unresolved
+        self._mtime = mtime
+        self._version += 1
+        logger.info("Loaded inference profiles", extra={"fields": {"profiles": list(profiles.keys())}})
+
+    def _reload_if_changed(self):
+        mtime = os.path.getmtime(self.config_path) if os.path.exists(self.config_path) else None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load()
+
+    @property
+    def version(self):
+        """Config version (picks up on-disk changes first)"""
+        self._reload_if_changed()
+        return self._version
+
+    def get(self, name):
+        """Get a profile dict by name (falls back to DEFAULT_PROFILE)"""
+        self._reload_if_changed()
+        return self.profiles.get(name, DEFAULT_PROFILE)
+
+    def model_kwargs(self, name):
+        """
+        Build keyword arguments for model(...) from a profile.
+        Class names are translated to class ids; unknown names are ignored.
+        Returns None when the profile names classes but none of them exist
+        (running without a class filter would return every class).
+        """
+        profile = self.get(name)
+        if name in self.unresolved:
+            return None
+
+        kwargs = {
+            "imgsz": profile["imgsz"],
+            "conf": profile["conf"],
+            "iou": profile["iou"],
+            "max_det": profile["max_det"]
+        }
+
+        if profile.get("classes"):
+            kwargs["classes"] = [self.name_to_id[c] for c in profile["classes"] if c in self.name_to_id]
+
+        return kwargs
+
+    def list_profiles(self):
+        """Get all profiles (for the /inference/profiles endpoint)"""
+        self._reload_if_changed()
+        return {name: dict(profile) for name, profile in self.profiles.items()}
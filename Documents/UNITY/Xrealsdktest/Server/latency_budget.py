@@ -0,0 +1,123 @@
+"""
+Latency Budget Module
+Per-request time budget for the /stream pipeline.
+
+The budget starts when the request arrives. Mandatory stages (decode,
+YOLO) always run; optional stages (custom-object matching) are skipped
+when the remaining budget is smaller than their recent cost, or cut short
+at the deadline. Every stage is recorded as ran / skipped / truncated so
+the response can say what the answer is based on.
+
+Budgets cross process boundaries as "milliseconds left": an inference
+worker starts its own LatencyBudget from the remaining time, and the
+stages it records are merged back into the request's budget.
+"""
+
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LatencyBudget:
+    def __init__(self, budget_ms=None):
+        # None = unlimited (stages are still timed); 0 = already spent
+        self.budget_ms = None if budget_ms is None else max(0.0, budget_ms)
+        self.started = time.perf_counter()
+        self.stages = []
+
+    @property
+    def deadline(self):
+        """perf_counter() value at which the budget is spent (None if unlimited)"""
+        if self.budget_ms is None:
+            return None
+        return self.started + self.budget_ms / 1000.0
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def remaining_ms(self):
+        if self.budget_ms is None:
+            return None
+        return max(0.0, self.budget_ms - self.elapsed_ms())
+
+    def allows(self, expected_ms=0.0):
+        """True if a stage expected to take expected_ms fits in what is left"""
+        remaining = self.remaining_ms()
+        return remaining is None or remaining > expected_ms
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a stage. The yielded dict can be marked {"status": "truncated"}
+        by the stage itself.
+        """
+        entry = {"name": name, "status": "ran"}
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+            self.stages.append(entry)
+
+    def skip(self, name, reason="budget"):
+        self.stages.append({"name": name, "status": "skipped", "reason": reason, "ms": 0.0})
+
+    def extend(self, stages):
+        """Merge stages recorded by another (worker-side) budget"""
+        self.stages.extend(stages)
+
+    def to_dict(self):
+        used = self.elapsed_ms()
+        return {
+            "budget_ms": self.budget_ms,
+            "used_ms": round(used, 1),
+            "exceeded": self.budget_ms is not None and used > self.budget_ms
+        }
+
+
+class BudgetStats:
+    """Recent budget use of finished requests (for /stream/stats)"""
+    def __init__(self, window=1000):
+        self._recent = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.exceeded = 0
+        self.skipped = collections.Counter()
+        self.truncated = collections.Counter()
+
+    def record(self, budget):
+        summary = budget.to_dict()
+        with self._lock:
+            self.requests += 1
+            if summary["exceeded"]:
+                self.exceeded += 1
+            for stage in budget.stages:
+                if stage["status"] == "skipped":
+                    self.skipped[stage["name"]] += 1
+                elif stage["status"] == "truncated":
+                    self.truncated[stage["name"]] += 1
+            fraction = summary["used_ms"] / summary["budget_ms"] if summary["budget_ms"] else None
+            self._recent.append((summary["used_ms"], fraction))
+
+    @staticmethod
+    def _percentile(values, q):
+        if not values:
+            return None
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    def get_stats(self):
+        with self._lock:
+            used = [u for u, _ in self._recent]
+            fractions = [f for _, f in self._recent if f is not None]
+            return {
+                "requests": self.requests,
+                "exceeded": self.exceeded,
+                "skipped_stages": dict(self.skipped),
+                "truncated_stages": dict(self.truncated),
+                "used_ms_p50": self._percentile(used, 0.5),
+                "used_ms_p95": self._percentile(used, 0.95),
+                "budget_used_p50": self._percentile(fractions, 0.5),
+                "budget_used_p95": self._percentile(fractions, 0.95)
+            }
@@ -0,0 +1,270 @@
+"""
+Load Test Harness
+Simulates N headsets against a running server (or one it starts itself).
+
+Each simulated headset streams frames to /stream at a fixed FPS and, mixed
+in, sends /log bursts, /search queries, /objects/identify and
+/identify_faces calls and occasional /objects/add_sample registrations.
+Throughput, error rate and latency percentiles are reported per endpoint.
+
+Usage:
+    # against an already running server
+    python load_test.py --url http://127.0.0.1:5000 --clients 4 --duration 30
+
+    # start server.py with stub models (no weights needed) and ramp up
+    python load_test.py --spawn-server --clients 1,2,4,8 --duration 20
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+import requests
+
+from benchmark_catalog import percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+REGISTRATION_NAME_PREFIX = "loadtest_"
+
+
+class EndpointStats:
+    """Thread-safe latency / error collector keyed by endpoint"""
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency_ms, ok):
+        with self._lock:
+            self.latencies[endpoint].append(latency_ms)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed_seconds):
+        rows = {}
+        with self._lock:
+            for endpoint, latencies in sorted(self.latencies.items()):
+                count = len(latencies)
+                rows[endpoint] = {
+                    "requests": count,
+                    "throughput_rps": round(count / elapsed_seconds, 2),
+                    "error_rate": round(self.errors[endpoint] / count, 4) if count else 0.0,
+                    "p50_ms": round(percentile(latencies, 50), 1),
+                    "p95_ms": round(percentile(latencies, 95), 1),
+                    "p99_ms": round(percentile(latencies, 99), 1),
+                    "max_ms": round(max(latencies), 1) if latencies else 0.0
+                }
+        return rows
+
+
+def make_frames(image_path, count=8):
+    """JPEG frames to send: the given image, or synthetic textured frames"""
+    if image_path:
+        with open(image_path, 'rb') as f:
+            return [f.read()]
+
+    frames = []
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        img = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        img = cv2.GaussianBlur(img, (5, 5), 0)
+        ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        frames.append(buf.tobytes())
+    return frames
+
+
+class Headset(threading.Thread):
+    """One simulated client"""
+    def __init__(self, client_id, base_url, frames, fps, stop_event, stats, mix):
+        super().__init__(daemon=True)
+        self.client_id = client_id
+        self.base_url = base_url
+        self.frames = frames
+        self.fps = fps
+        self.stop_event = stop_event
+        self.stats = stats
+        self.mix = mix
+        self.rng = random.Random(client_id)
+        self.session = requests.Session()
+        self.session.headers["X-Client-Id"] = f"loadtest-{client_id}"
+
+    def _call(self, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            pass
+        self.stats.record(endpoint, (time.perf_counter() - start) * 1000, ok)
+
+    def _frame(self):
+        return self.rng.choice(self.frames)
+
+    def run(self):
+        interval = 1.0 / self.fps if self.fps > 0 else 0
+        next_tick = time.perf_counter()
+
+        while not self.stop_event.is_set():
+            self._call("/stream", "POST", "/stream",
+                       files={"image": ("stream.jpg", self._frame(), "image/jpeg")})
+
+            if self.rng.random() < self.mix["log"]:
+                for i in range(5):
+                    self._call("/log", "POST", "/log",
+                               json={"type": "Log", "message": f"loadtest {self.client_id} #{i}"})
+            if self.rng.random() < self.mix["search"]:
+                self._call("/search", "GET", "/search", params={"q": self.rng.choice(["cup", "person", "all"])})
+            if self.rng.random() < self.mix["identify_objects"]:
+                self._call("/objects/identify", "POST", "/objects/identify",
+                           files={"image": ("frame.jpg", self._frame(), "image/jpeg")})
+            if self.rng.random() < self.mix["identify_faces"]:
+                self._call("/identify_faces", "POST", "/identify_faces",
+                           files={"image": ("frame.jpg", self._frame(), "image/jpeg")})
+            if self.rng.random() < self.mix["register"]:
+                self._call("/objects/add_sample", "POST", "/objects/add_sample",
+                           data={"name": f"{REGISTRATION_NAME_PREFIX}{self.client_id}"},
+                           files={"image": ("frame.jpg", self._frame(), "image/jpeg")})
+
+            if interval:
+                next_tick += interval
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    self.stop_event.wait(delay)
+                else:
+                    next_tick = time.perf_counter()  # falling behind: don't burst to catch up
+
+
+def wait_for_server(base_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + "/ping", timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    return False
+
+
+def spawn_server(port, data_root):
+    """
+    Start the server in stub-model mode as a child process.
+    All server data (captures, registrations, logs) goes under data_root
+    so a load run leaves the real uploads/object_data/unity_logs untouched.
+    app.run is called directly (no debug reloader) so terminate() stops it.
+    """
+    env = dict(os.environ, SERVER_STUB_MODELS="1", SERVER_DATA_ROOT=data_root)
+    code = f"import server; server.app.run(host='0.0.0.0', port={port}, threaded=True)"
+    return subprocess.Popen([sys.executable, "-c", code],
+                            cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_stage(base_url, clients, args, frames, mix):
+    stats = EndpointStats()
+    stop_event = threading.Event()
+    headsets = [Headset(i, base_url, frames, args.fps, stop_event, stats, mix) for i in range(clients)]
+
+    start = time.perf_counter()
+    for h in headsets:
+        h.start()
+    time.sleep(args.duration)
+    stop_event.set()
+    for h in headsets:
+        h.join(timeout=35)
+    elapsed = time.perf_counter() - start
+
+    return stats.summary(elapsed)
+
+
+def cleanup_registrations(base_url, max_clients):
+    for i in range(max_clients):
+        try:
+            requests.post(base_url + "/objects/delete",
+                          json={"name": f"{REGISTRATION_NAME_PREFIX}{i}"}, timeout=10)
+        except requests.RequestException:
+            pass
+
+
+def print_stage(clients, rows):
+    print(f"\n=== {clients} client(s) ===")
+    print(f"{'endpoint':<20}{'reqs':>7}{'rps':>8}{'err%':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}")
+    for endpoint, r in rows.items():
+        print(f"{endpoint:<20}{r['requests']:>7}{r['throughput_rps']:>8.1f}{r['error_rate'] * 100:>7.1f}"
+              f"{r['p50_ms']:>8.0f}{r['p95_ms']:>8.0f}{r['p99_ms']:>8.0f}{r['max_ms']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-headset load test")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--spawn-server", action="store_true",
+                        help="Start server.py with SERVER_STUB_MODELS=1 and a temporary data root "
+                             "for the duration of the test")
+    parser.add_argument("--clients", default="4", help="Client count, or comma separated ramp (1,2,4,8)")
+    parser.add_argument("--fps", type=float, default=2.0, help="/stream frames per second per client")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per stage")
+    parser.add_argument("--image", help="JPEG to send instead of synthetic frames")
+    parser.add_argument("--log-rate", type=float, default=0.2)
+    parser.add_argument("--search-rate", type=float, default=0.05)
+    parser.add_argument("--identify-rate", type=float, default=0.1)
+    parser.add_argument("--faces-rate", type=float, default=0.1)
+    parser.add_argument("--register-rate", type=float, default=0.01)
+    parser.add_argument("--json-out", help="Write all stage results to this JSON file")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+    stages = [int(c) for c in args.clients.split(",") if c.strip()]
+    mix = {
+        "log": args.log_rate,
+        "search": args.search_rate,
+        "identify_objects": args.identify_rate,
+        "identify_faces": args.faces_rate,
+        "register": args.register_rate
+    }
+    frames = make_frames(args.image)
+
+    server = None
+    data_root = None
+    if args.spawn_server:
+        data_root = tempfile.mkdtemp(prefix="load_test_")
+        server = spawn_server(urlparse(base_url).port or 5000, data_root)
+    try:
+        if not wait_for_server(base_url):
+            print(f"Server at {base_url} did not respond to /ping")
+            return
+
+        results = {}
+        for clients in stages:
+            rows = run_stage(base_url, clients, args, frames, mix)
+            results[str(clients)] = rows
+            print_stage(clients, rows)
+
+        cleanup_registrations(base_url, max(stages))
+
+        if args.json_out:
+            with open(args.json_out, 'w', encoding='utf-8') as f:
+                json.dump({"config": vars(args), "stages": results}, f, indent=2)
+            print(f"\nResults written to {args.json_out}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if data_root is not None:
+            shutil.rmtree(data_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Metadata Store Module
+Journaled JSON store for recognizer metadata (faces.json / objects.json).
+
+Every change appends one small JSON line to a journal instead of rewriting
+the whole file. The journal is compacted into the snapshot (the original
+.json file, written atomically) on a background thread, and snapshot +
+journal are replayed at startup. Set/delete records are idempotent, so
+replaying records that already made it into the snapshot is harmless and
+a crash loses at most the record being written.
+
+The store owns `data`: it is only modified under the store lock, through
+set()/delete(), and never shares objects with callers (values are stored
+as parsed copies of the journal line, get() returns a copy). Callers keep
+their own working dicts, so a background compaction can serialise `data`
+while recognizers keep changing theirs.
+
+A read-only store (used by inference worker processes) replays the same
+files but never truncates, compacts or appends.
+"""
+
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class JournaledStore:
+    def __init__(self, snapshot_path, compact_every=200, fsync=True, read_only=False):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        # Journal being folded into the snapshot by a running compaction
+        self.compacting_path = snapshot_path + ".journal.old"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.read_only = read_only
+
+        self.data = {}
+        self.records_since_compaction = 0
+
+        self._lock = threading.Lock()
+        # Serialises compactions (they share the .tmp and .journal.old files)
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread = None
+        self._journal = None
+
+        self._load()
+        if read_only:
+            return
+        if os.path.exists(self.compacting_path):
+            # A compaction was interrupted: finish it before accepting writes
+            self._write_snapshot(json.dumps(self.data, ensure_ascii=False, indent=2))
+            os.remove(self.compacting_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _load(self):
+        """Load the snapshot, then replay any journals on top of it"""
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+        replayed = 0
+        for path in (self.compacting_path, self.journal_path):
+            replayed += self._replay(path)
+        self.records_since_compaction = replayed
+
+    def _replay(self, journal_path):
+        if not os.path.exists(journal_path):
+            return 0
+
+        count = 0
+        good_offset = 0
+        with open(journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    break
+                self._apply(record)
+                good_offset += len(line)
+                count += 1
+
+        if good_offset < os.path.getsize(journal_path) and not self.read_only:
+            # Torn write from a crash: keep everything before it and cut the
+            # tail so new records don't get appended onto a broken line
+            logger.warning("Dropping incomplete journal record", extra={"fields": {"file": os.path.basename(journal_path)}})
+            with open(journal_path, 'r+b') as f:
+                f.truncate(good_offset)
+        return count
+
+    def _apply(self, record):
+        *parents, key = record["path"]
+        node = self.data
+        for part in parents:
+            node = node.setdefault(part, {})
+
+        if record["op"] == "set":
+            node[key] = record["value"]
+        elif record["op"] == "delete":
+            node.pop(key, None)
+
+    def _append(self, record):
+        if self.read_only:
+            raise RuntimeError(f"{os.path.basename(self.snapshot_path)} is opened read-only")
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            # Apply a private copy so later changes to the caller's value
+            # can't reach `data` outside the lock
+            self._apply(json.loads(line))
+            self._journal.write(line + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self.records_since_compaction += 1
+            should_compact = self.records_since_compaction >= self.compact_every
+
+        if should_compact:
+            self.compact_async()
+
+    def get(self, path=(), default=None):
+        """Copy of data[path[0]][path[1]]... (default if missing)"""
+        with self._lock:
+            node = self.data
+            for part in path:
+                if not isinstance(node, dict) or part not in node:
+                    return default
+                node = node[part]
+            return json.loads(json.dumps(node))
+
+    def set(self, path, value):
+        """Set data[path[0]][path[1]]... = value"""
+        self._append({"op": "set", "path": list(path), "value": value})
+
+    def delete(self, path):
+        """Remove data[path[0]][path[1]]... (no-op if missing)"""
+        self._append({"op": "delete", "path": list(path)})
+
+    def compact_async(self):
+        """Start a background compaction unless one is already running"""
+        if self.read_only:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+        self._compaction_thread.start()
+
+    def compact(self):
+        """Fold the journal into a new snapshot"""
+        if self.read_only:
+            return
+        with self._compaction_lock:
+            self._compact()
+
+    def _compact(self):
+        try:
+            with self._lock:
+                snapshot = json.dumps(self.data, ensure_ascii=False, indent=2)
+
+                # Rotate the journal: new writes go to a fresh file while the
+                # snapshot is written outside the lock. If an earlier compaction
+                # failed, its rotated journal is still pending and the current
+                # journal only holds later records, which this snapshot covers.
+                if not os.path.exists(self.compacting_path):
+                    self._journal.close()
+                    os.replace(self.journal_path, self.compacting_path)
+                    self._journal = open(self.journal_path, 'a', encoding='utf-8')
+                self.records_since_compaction = 0
+
+            self._write_snapshot(snapshot)
+            os.remove(self.compacting_path)
+        except Exception as e:
+            logger.error("Compaction failed", extra={"fields": {
+                "file": os.path.basename(self.snapshot_path), "error": str(e)}})
+
+    def _write_snapshot(self, snapshot):
+        """Atomically replace the snapshot file"""
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def close(self):
+        """Flush and close the journal"""
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
@@ -2,25 +2,37 @@
 Object Recognition Module
 Uses OpenCV's ORB (Oriented FAST and Rotated BRIEF) for object recognition.
 Allows users to register custom objects and identify them later.
+Registration and identification extract features with separate ORB
+profiles (see orb_profiles.py).
 """
 
 import cv2
+import logging
 import numpy as np
 import os
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from hamming_matcher import HammingMatcher
+from metadata_store import JournaledStore
+from orb_profiles import OrbProfiles
+from visual_vocabulary import VisualVocabulary
+
+logger = logging.getLogger(__name__)
 
 class ObjectRecognizer:
-    def __init__(self, data_dir="object_data"):
+    def __init__(self, data_dir="object_data", prefilter_top_k=5, read_only=False, orb_profiles_path=None):
         self.data_dir = data_dir
+        # Read-only instances (inference workers) load the catalog but never write it
+        self.read_only = read_only
         self.objects_json = os.path.join(data_dir, "objects.json")
         
         # Create data directory if not exists
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
         
-        # ORB detector (good balance of speed and accuracy)
-        self.orb = cv2.ORB_create(nfeatures=1000)
+        # ORB extraction profiles: rich for registration, lean for /stream
+        self.orb_profiles = OrbProfiles(orb_profiles_path)
         
         # FLANN matcher for faster matching
         FLANN_INDEX_LSH = 6
@@ -31,8 +43,8 @@ class ObjectRecognizer:
         search_params = dict(checks=50)
         self.matcher = cv2.FlannBasedMatcher(index_params, search_params)
         
-        # BFMatcher as fallback
-        self.bf_matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+        # Array-based k=2 Hamming matcher used for the ratio test
+        self.hamming_matcher = HammingMatcher()
         
         # Object data: {name: {"descriptors_path": "...", "keypoints_count": N, "registered_at": "..."}}
         self.objects = {}
@@ -40,27 +52,40 @@ class ObjectRecognizer:
         # Cached descriptors for faster matching
         self.cached_descriptors = {}
         
+        # Catalog version: bumped on every register/add/delete so callers
+        # can tell when previously computed results are stale
+        self.version = 0
+        
+        # Bag-of-visual-words prefilter: full matching only runs on the
+        # top-K candidates once the catalog is larger than K
+        self.prefilter_top_k = prefilter_top_k
+        self.vocabulary = VisualVocabulary()
+        self._vocabulary_version = -1
+        
         # Load existing data
         self._load_data()
     
     def _load_data(self):
-        """Load saved object data"""
-        if os.path.exists(self.objects_json):
-            with open(self.objects_json, 'r', encoding='utf-8') as f:
-                self.objects = json.load(f)
-            
-            # Load descriptors into cache
-            for name, info in self.objects.items():
-                desc_path = os.path.join(self.data_dir, f"{name}_descriptors.npy")
-                if os.path.exists(desc_path):
-                    self.cached_descriptors[name] = np.load(desc_path)
-            
+        """Load saved object data (objects.json snapshot + journal)"""
+        self.store = JournaledStore(self.objects_json, read_only=self.read_only)
+        # Working copy; changes are journaled through _save_object
+        self.objects = self.store.get()
+        
+        # Load descriptors into cache
+        for name, info in self.objects.items():
+            desc_path = os.path.join(self.data_dir, f"{name}_descriptors.npy")
+            if os.path.exists(desc_path):
+                self.cached_descriptors[name] = np.load(desc_path)
+        
+        if self.objects:
             print(f"[ObjectRecognizer] Loaded {len(self.objects)} registered objects")
     
-    def _save_data(self):
-        """Save object data"""
-        with open(self.objects_json, 'w', encoding='utf-8') as f:
-            json.dump(self.objects, f, ensure_ascii=False, indent=2)
+    def _save_object(self, name):
+        """Journal the metadata change for one object"""
+        if name in self.objects:
+            self.store.set([name], self.objects[name])
+        else:
+            self.store.delete([name])
     
     def register_object(self, image, name):
         """
@@ -76,15 +101,8 @@ class ObjectRecognizer:
         
         name = name.strip()
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Enhance contrast
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        gray = clahe.apply(gray)
-        
-        # Detect keypoints and compute descriptors
-        keypoints, descriptors = self.orb.detectAndCompute(gray, None)
+        # Detect keypoints and compute descriptors ('register' profile)
+        keypoints, descriptors = self.orb_profiles.extract("register", image)
         
         if descriptors is None or len(keypoints) < 10:
             return {"success": False, "message": "Not enough features detected. Try a more textured object or different angle."}
@@ -107,9 +125,10 @@ class ObjectRecognizer:
         
         # Update cache
         self.cached_descriptors[name] = descriptors
+        self.version += 1
         
         # Save to file
-        self._save_data()
+        self._save_object(name)
         
         print(f"[ObjectRecognizer] Registered object '{name}' with {len(keypoints)} keypoints")
         
@@ -134,15 +153,8 @@ class ObjectRecognizer:
         
         name = name.strip()
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Enhance contrast
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        gray = clahe.apply(gray)
-        
-        # Detect keypoints and compute descriptors
-        keypoints, new_descriptors = self.orb.detectAndCompute(gray, None)
+        # Detect keypoints and compute descriptors ('register' profile)
+        keypoints, new_descriptors = self.orb_profiles.extract("register", image)
         
         if new_descriptors is None or len(keypoints) < 5:
             return {"success": False, "message": "Not enough features in this frame", "current_features": 0}
@@ -179,11 +191,13 @@ class ObjectRecognizer:
             "descriptors_count": total_features,
             "registered_at": datetime.now().isoformat()
         }
+        self.version += 1
         
         # Save metadata
-        self._save_data()
+        self._save_object(name)
         
-        print(f"[ObjectRecognizer] Added sample to '{name}': +{len(new_descriptors)} features (total: {total_features})")
+        logger.info("Added sample", extra={"fields": {
+            "object": name, "added": len(new_descriptors), "total": total_features}})
         
         return {
             "success": True,
@@ -192,10 +206,113 @@ class ObjectRecognizer:
             "added_features": len(new_descriptors)
         }
     
-    def identify_objects(self, image, min_matches=15, ratio_threshold=0.75):
+    def _extract_sample_features(self, image):
+        """
+        Extract ORB descriptors from one registration frame.
+        Runs on worker threads (the extractor keeps one ORB instance per thread).
+        Returns: (descriptors or None, message)
+        """
+        if image is None:
+            return None, "Invalid image"
+        
+        keypoints, descriptors = self.orb_profiles.extract("register", image)
+        
+        if descriptors is None or len(keypoints) < 5:
+            return None, "Not enough features in this frame"
+        
+        return descriptors, "OK"
+    
+    def add_samples_to_object(self, images, name, max_workers=4):
+        """
+        Add many sample images to an object in one call.
+        Features are extracted in parallel, merged once and persisted once.
+        Returns: {"success": True/False, "message": "...", "current_features": N,
+                  "added_features": N, "frames": [{"index": i, "features": n, ...}]}
+        """
+        if not name or len(name.strip()) == 0:
+            return {"success": False, "message": "Name is required", "current_features": 0, "frames": []}
+        
+        if not images:
+            return {"success": False, "message": "No images provided", "current_features": 0, "frames": []}
+        
+        name = name.strip()
+        
+        # OpenCV releases the GIL, so threads give real parallelism here
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            extracted = list(executor.map(self._extract_sample_features, images))
+        
+        frames = []
+        new_blocks = []
+        first_valid_image = None
+        for idx, (descriptors, message) in enumerate(extracted):
+            if descriptors is None:
+                frames.append({"index": idx, "features": 0, "accepted": False, "message": message})
+                continue
+            frames.append({"index": idx, "features": len(descriptors), "accepted": True})
+            new_blocks.append(descriptors)
+            if first_valid_image is None:
+                first_valid_image = images[idx]
+        
+        current = self.cached_descriptors.get(name)
+        if not new_blocks:
+            return {
+                "success": False,
+                "message": "Not enough features in any frame",
+                "current_features": len(current) if current is not None else 0,
+                "added_features": 0,
+                "frames": frames
+            }
+        
+        added_features = sum(len(b) for b in new_blocks)
+        
+        # Merge once (same 30000 cap as add_sample_to_object)
+        blocks = [current] + new_blocks if current is not None else new_blocks
+        combined_desc = np.vstack(blocks)
+        if len(combined_desc) > 30000:
+            combined_desc = combined_desc[-30000:]
+        
+        desc_path = os.path.join(self.data_dir, f"{name}_descriptors.npy")
+        np.save(desc_path, combined_desc)
+        
+        if current is None:
+            # Save first usable frame as thumbnail
+            thumb_path = os.path.join(self.data_dir, f"{name}_thumbnail.jpg")
+            thumbnail = cv2.resize(first_valid_image, (100, 100))
+            cv2.imwrite(thumb_path, thumbnail)
+        
+        self.cached_descriptors[name] = combined_desc
+        total_features = len(combined_desc)
+        
+        self.objects[name] = {
+            "keypoints_count": total_features,
+            "descriptors_count": total_features,
+            "registered_at": datetime.now().isoformat()
+        }
+        self.version += 1
+        
+        # Save metadata once for the whole batch
+        self._save_object(name)
+        
+        accepted = len(new_blocks)
+        logger.info("Added samples", extra={"fields": {
+            "object": name, "accepted": accepted, "frames": len(images),
+            "added": added_features, "total": total_features}})
+        
+        return {
+            "success": True,
+            "message": f"Added {added_features} features from {accepted}/{len(images)} frames",
+            "current_features": total_features,
+            "added_features": added_features,
+            "frames": frames
+        }
+    
+    def identify_objects(self, image, min_matches=15, ratio_threshold=0.75, deadline=None, profile="identify"):
         """
         Identify registered objects in an image.
         Uses ratio test for robust matching.
+        profile: ORB profile for the query features ('identify' or the lean 'stream')
+        deadline: time.perf_counter() value; remaining candidates are not
+        matched once it has passed ("truncated": True in the result)
         Returns: {"success": True, "objects": [{"name": "...", "confidence": ...}, ...]}
         """
         if image is None:
@@ -204,57 +321,75 @@ class ObjectRecognizer:
         if len(self.cached_descriptors) == 0:
             return {"success": True, "message": "No objects registered", "objects": []}
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Enhance contrast
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        gray = clahe.apply(gray)
-        
         # Detect keypoints and compute descriptors
-        keypoints, descriptors = self.orb.detectAndCompute(gray, None)
+        keypoints, descriptors = self.orb_profiles.extract(profile, image)
         
         if descriptors is None or len(keypoints) < 5:
             return {"success": True, "message": "Not enough features in image", "objects": []}
         
         detected_objects = []
-        
-        for name, stored_desc in self.cached_descriptors.items():
+        debug = logger.isEnabledFor(logging.DEBUG)
+        truncated = False
+        
+        # Prefiltered candidates come best first, so a cut keeps the most likely ones
+        for name in self._select_candidates(descriptors):
+            if deadline is not None and time.perf_counter() >= deadline:
+                truncated = True
+                break
+            stored_desc = self.cached_descriptors.get(name)
+            if stored_desc is None:
+                continue
             try:
-                # Use BFMatcher with knnMatch
-                matches = self.bf_matcher.knnMatch(stored_desc, descriptors, k=2)
-                
-                # Apply ratio test (Lowe's ratio test)
-                good_matches = []
-                for match in matches:
-                    if len(match) == 2:
-                        m, n = match
-                        if m.distance < ratio_threshold * n.distance:
-                            good_matches.append(m)
+                # k=2 matching + Lowe's ratio test on the raw descriptor arrays
+                good_count, _, _ = self.hamming_matcher.ratio_match(stored_desc, descriptors, ratio_threshold)
                 
                 # Calculate confidence based on number of good matches
-                if len(good_matches) >= min_matches:
+                if good_count >= min_matches:
                     # Confidence: ratio of good matches to total stored features
-                    confidence = min(1.0, len(good_matches) / (min_matches * 2))
+                    confidence = min(1.0, good_count / (min_matches * 2))
                     detected_objects.append({
                         "name": name,
-                        "matches": len(good_matches),
+                        "matches": good_count,
                         "confidence": round(confidence, 2)
                     })
-                    print(f"[ObjectRecognizer] Detected '{name}' with {len(good_matches)} matches (conf: {confidence:.2f})")
+                    if debug:
+                        logger.debug("Detected object", extra={"fields": {
+                            "object": name, "matches": good_count, "confidence": round(confidence, 2)}})
             
             except Exception as e:
-                print(f"[ObjectRecognizer] Error matching {name}: {e}")
+                logger.warning("Error matching object", extra={"fields": {"object": name, "error": str(e)}})
                 continue
         
         # Sort by confidence
         detected_objects.sort(key=lambda x: x["confidence"], reverse=True)
         
-        return {
+        result = {
             "success": True,
             "message": f"Found {len(detected_objects)} objects",
             "objects": detected_objects
         }
+        if truncated:
+            result["truncated"] = True
+        return result
+    
+    def _select_candidates(self, descriptors):
+        """
+        Stage 1 of the recognition cascade.
+        Returns the names worth running full descriptor matching on.
+        """
+        names = list(self.cached_descriptors.keys())
+        if self.prefilter_top_k <= 0 or len(names) <= self.prefilter_top_k:
+            return names
+        
+        # Refresh words/histograms only when the catalog has changed
+        # (read the version before the snapshot: an object registered during
+        # sync() then leaves the vocabulary marked stale instead of current)
+        version = self.version
+        if self._vocabulary_version != version:
+            self.vocabulary.sync(dict(self.cached_descriptors))
+            self._vocabulary_version = version
+        
+        return self.vocabulary.top_candidates(descriptors, self.prefilter_top_k)
     
     def list_objects(self):
         """
@@ -325,9 +460,10 @@ class ObjectRecognizer:
         del self.objects[name]
         if name in self.cached_descriptors:
             del self.cached_descriptors[name]
+        self.version += 1
         
         # Save
-        self._save_data()
+        self._save_object(name)
         
         print(f"[ObjectRecognizer] Deleted object '{name}'")
         
@@ -0,0 +1,214 @@
+"""
+ORB Profiles Module
+Per-use ORB extraction settings for ObjectRecognizer.
+
+Registration wants many well-spread features at full detail; real-time
+/stream identification only needs enough of them to confirm a known object.
+Each profile sets:
+    max_dim         longest side of the working image (None = full resolution)
+    nfeatures       ORB feature budget
+    nlevels         pyramid levels, scale_factor between them
+    fast_threshold  FAST corner threshold (higher = fewer, stronger corners)
+    grid            [cols, rows] to spread keypoints evenly over the image
+                    (best responses per cell), or None
+    clahe           contrast enhancement before detection
+Profiles are read from orb_profiles.json (missing keys and profiles fall
+back to DEFAULT_PROFILES) and re-read when the file changes on disk. A file
+that cannot be parsed keeps the previous profiles (DEFAULT_PROFILES at
+startup).
+"""
+
+import json
+import logging
+import os
+import threading
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILES = {
+    # Registration: rich and evenly spread, stored once per sample
+    "register": {
+        "max_dim": 1280,
+        "nfeatures": 1500,
+        "nlevels": 8,
+        "scale_factor": 1.2,
+        "fast_threshold": 20,
+        "grid": [4, 4],
+        "clahe": True
+    },
+    # /objects/identify: user-triggered, close to the registration detail
+    "identify": {
+        "max_dim": 960,
+        "nfeatures": 1000,
+        "nlevels": 8,
+        "scale_factor": 1.2,
+        "fast_threshold": 20,
+        "grid": None,
+        "clahe": True
+    },
+    # /stream: every frame, lean
+    "stream": {
+        "max_dim": 480,
+        "nfeatures": 500,
+        "nlevels": 4,
+        "scale_factor": 1.2,
+        "fast_threshold": 20,
+        "grid": None,
+        "clahe": True
+    }
+}
+
+
+class OrbExtractor:
+    """Applies one profile; ORB instances are per thread (detectAndCompute is not re-entrant)"""
+    def __init__(self, profile):
+        self.profile = profile
+        self._thread_local = threading.local()
+        self._clahe = threading.local()
+
+    def _orb(self):
+        orb = getattr(self._thread_local, "orb", None)
+        if orb is None:
+            p = self.profile
+            # With a grid, over-detect and let the per-cell selection keep the budget
+            nfeatures = p["nfeatures"] * 3 if p.get("grid") else p["nfeatures"]
+            orb = cv2.ORB_create(
+                nfeatures=nfeatures,
+                scaleFactor=p["scale_factor"],
+                nlevels=p["nlevels"],
+                fastThreshold=p["fast_threshold"]
+            )
+            self._thread_local.orb = orb
+        return orb
+
+    def prepare(self, image):
+        """BGR image -> grayscale working image (downscaled, CLAHE)"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+        max_dim = self.profile.get("max_dim")
+        height, width = gray.shape[:2]
+        if max_dim and max(height, width) > max_dim:
+            scale = max_dim / float(max(height, width))
+            gray = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                              interpolation=cv2.INTER_AREA)
+
+        if self.profile.get("clahe", True):
+            clahe = getattr(self._clahe, "clahe", None)
+            if clahe is None:
+                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+                self._clahe.clahe = clahe
+            gray = clahe.apply(gray)
+        return gray
+
+    def _grid_select(self, keypoints, shape):
+        """Keep the strongest keypoints of every grid cell (nfeatures in total)"""
+        cols, rows = self.profile["grid"]
+        height, width = shape[:2]
+        per_cell = max(1, self.profile["nfeatures"] // (cols * rows))
+
+        cells = {}
+        for kp in keypoints:
+            cell = (min(cols - 1, int(kp.pt[0] * cols / width)), min(rows - 1, int(kp.pt[1] * rows / height)))
+            cells.setdefault(cell, []).append(kp)
+
+        selected = []
+        for cell_kps in cells.values():
+            cell_kps.sort(key=lambda kp: kp.response, reverse=True)
+            selected.extend(cell_kps[:per_cell])
+        return selected
+
+    def extract(self, image):
+        """
+        Keypoints (in working-image coordinates) and descriptors.
+        Returns: (keypoints, descriptors or None)
+        """
+        gray = self.prepare(image)
+        orb = self._orb()
+        if not self.profile.get("grid"):
+            return orb.detectAndCompute(gray, None)
+
+        keypoints = orb.detect(gray, None)
+        keypoints = self._grid_select(keypoints, gray.shape)
+        if not keypoints:
+            return [], None
+        return orb.compute(gray, keypoints)
+
+
+class OrbProfiles:
+    def __init__(self, config_path=None):
+        """config_path: path to orb_profiles.json (None = built-in defaults only)"""
+        self.config_path = config_path
+
+        self.profiles = {}
+        self._extractors = {}
+        self._mtime = None
+        # Bumped on every (re)load so cached results can be invalidated
+        self._version = 0
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        """Load (or reload) profiles from the config file"""
+        raw = {}
+        mtime = None
+
+        if self.config_path and os.path.exists(self.config_path):
+            mtime = os.path.getmtime(self.config_path)
+            try:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+            except Exception as e:
+                logger.error("Could not load ORB profiles", extra={"fields": {"path": self.config_path, "error": str(e)}})
+                # Don't re-read the broken file until it changes again
+                self._mtime = mtime
+                if self._extractors:
+                    return  # keep the previous profiles
+                raw = {}  # nothing loaded yet: built-in defaults
+
+        profiles = {}
+        for name in set(DEFAULT_PROFILES) | set(raw):
+            profile = dict(DEFAULT_PROFILES.get(name, DEFAULT_PROFILES["identify"]))
+            profile.update(raw.get(name, {}))
+            profiles[name] = profile
+
+        # Reuse extractors (and their per-thread ORB instances) of unchanged profiles
+        extractors = {}
+        for name, profile in profiles.items():
+            old = self._extractors.get(name)
+            extractors[name] = old if old is not None and old.profile == profile else OrbExtractor(profile)
+
+        self.profiles = profiles
+        self._extractors = extractors
+        self._mtime = mtime
+        self._version += 1
+
+    def _reload_if_changed(self):
+        if not self.config_path:
+            return
+        mtime = os.path.getmtime(self.config_path) if os.path.exists(self.config_path) else None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load()
+
+    @property
+    def version(self):
+        """Config version (picks up on-disk changes first)"""
+        self._reload_if_changed()
+        return self._version
+
+    def extractor(self, name):
+        """OrbExtractor for a profile name (unknown names use 'identify')"""
+        self._reload_if_changed()
+        extractors = self._extractors
+        return extractors.get(name) or extractors["identify"]
+
+    def extract(self, name, image):
+        return self.extractor(name).extract(image)
+
+    def list_profiles(self):
+        self._reload_if_changed()
+        return {name: dict(profile) for name, profile in self.profiles.items()}
@@ -0,0 +1,128 @@
+"""
+Request Profiler Module
+On-demand cProfile capture for individual Flask requests.
+
+A request is profiled when an allow-listed client sends the header
+"X-Profile: 1" (or "?profile=1"), or when sampling picks it (1 in N).
+The profile covers the whole handler, including ObjectRecognizer /
+FaceRecognizer calls, and is written as <profiles_dir>/<name>.prof plus a
+<name>.txt summary. Oldest profiles are removed beyond a total size cap.
+When no request is selected the hooks only read one header and a counter.
+
+Note: from Python 3.12 cProfile uses sys.monitoring, which allows only one
+active profiler per process; overlapping requests are then skipped.
+"""
+
+import cProfile
+import glob
+import io
+import itertools
+import logging
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfiler:
+    def __init__(self, profiles_dir, allowed_clients=("127.0.0.1",), sample_every=0,
+                 max_total_bytes=100 * 1024 * 1024, skip_paths=("/log", "/ping", "/profiles")):
+        self.profiles_dir = profiles_dir
+        self.allowed_clients = set(allowed_clients)
+        self.sample_every = sample_every
+        self.max_total_bytes = max_total_bytes
+        self.skip_paths = tuple(skip_paths)
+
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+        if not os.path.exists(profiles_dir):
+            os.makedirs(profiles_dir)
+
+    def install(self, app):
+        """Register the before/teardown hooks on a Flask app"""
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def is_allowed(self, remote_addr):
+        return remote_addr in self.allowed_clients
+
+    def _should_profile(self):
+        flag = request.headers.get("X-Profile") or request.args.get("profile")
+        if flag == "1" and self.is_allowed(request.remote_addr):
+            return True
+
+        if self.sample_every > 0 and not request.path.startswith(self.skip_paths):
+            return next(self._counter) % self.sample_every == 0
+
+        return False
+
+    def _before_request(self):
+        if not self._should_profile():
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return  # another request is already being profiled (Python 3.12+)
+
+        g._request_profiler = (profiler, time.perf_counter())
+
+    def _teardown_request(self, exc=None):
+        state = g.pop("_request_profiler", None)
+        if state is None:
+            return
+
+        profiler, started = state
+        profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            self._save(profiler, request.endpoint or "unknown", duration_ms)
+        except Exception as e:
+            logger.warning("Could not save profile", extra={"fields": {"error": str(e)}})
+
+    def _save(self, profiler, endpoint, duration_ms):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        name = f"{timestamp}_{endpoint}_{int(duration_ms)}ms"
+        prof_path = os.path.join(self.profiles_dir, f"{name}.prof")
+        profiler.dump_stats(prof_path)
+
+        # Human-readable summary next to the binary profile
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        stats.sort_stats("cumulative").print_stats(40)
+        with open(os.path.join(self.profiles_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(f"{request.method} {request.full_path} ({duration_ms:.1f} ms)\n\n")
+            f.write(summary.getvalue())
+
+        logger.info("Saved profile", extra={"fields": {"name": name, "duration_ms": round(duration_ms, 1)}})
+        self._enforce_size_cap()
+
+    def _enforce_size_cap(self):
+        """Delete the oldest profiles until the directory fits the cap"""
+        with self._lock:
+            files = sorted(glob.glob(os.path.join(self.profiles_dir, "*.*")), key=os.path.getmtime)
+            total = sum(os.path.getsize(p) for p in files)
+            while files and total > self.max_total_bytes:
+                oldest = files.pop(0)
+                total -= os.path.getsize(oldest)
+                os.remove(oldest)
+
+    def list_profiles(self):
+        """Saved profiles, newest first"""
+        profiles = []
+        for path in sorted(glob.glob(os.path.join(self.profiles_dir, "*.prof")), reverse=True):
+            name = os.path.basename(path)
+            profiles.append({
+                "name": name,
+                "summary": name[:-len(".prof")] + ".txt",
+                "bytes": os.path.getsize(path)
+            })
+        return profiles
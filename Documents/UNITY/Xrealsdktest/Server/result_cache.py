@@ -0,0 +1,89 @@
+"""
+Result Cache Module
+LRU cache for identify endpoint results.
+Entries are keyed by a hash of the uploaded image bytes together with the
+catalog/model versions that produced them, so any registration or deletion
+makes older entries unreachable.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    def __init__(self, max_entries=256, ttl_seconds=60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (stored_at, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(endpoint, image_bytes, *versions):
+        """
+        Build a cache key from the endpoint name, the raw image bytes and
+        any version values (catalog version, model version, ...).
+        """
+        digest = hashlib.sha1(image_bytes).hexdigest()
+        version_str = ":".join(str(v) for v in versions)
+        return f"{endpoint}:{digest}:{version_str}"
+
+    def get(self, key):
+        """Return the cached value for key, or None on miss/expiry"""
+        if self.max_entries <= 0:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry if full"""
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Get hit/miss statistics"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "miss_rate": round(self.misses / total, 3) if total else 0.0
+            }
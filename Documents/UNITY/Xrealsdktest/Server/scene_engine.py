@@ -0,0 +1,227 @@
+"""
+Scene Engine Module
+Scene inference for /stream from detected labels (replaces infer_scene).
+
+Rules map a scene to its labels, either as a list (each label weighs
+1 / len(list), the old "matched / keywords" score) or as {label: weight}.
+They are compiled once into an inverted index label -> [(scene, weight)],
+so scoring a frame only touches the scenes its labels point to. The index
+is rebuilt only when scene_rules.json changes on disk.
+
+Single frames are noisy (a cup and a fork flip kitchen <-> dining), so
+each client session keeps a sliding window of recent frame scores. The
+smoothed score of a scene is the recency-weighted mean of its frame
+scores (half-life decay), and the current label only changes when another
+scene beats it by switch_margin.
+"""
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Used when scene_rules.json is missing
+DEFAULT_SCENE_RULES = {
+    'office': ['laptop', 'keyboard', 'mouse', 'monitor', 'book', 'chair', 'desk'],
+    'kitchen': ['cup', 'bottle', 'bowl', 'fork', 'knife', 'spoon', 'microwave', 'oven', 'refrigerator', 'sink'],
+    'livingroom': ['couch', 'tv', 'remote', 'potted plant', 'clock', 'vase'],
+    'street': ['car', 'truck', 'bus', 'motorcycle', 'bicycle', 'traffic light', 'stop sign'],
+    'outdoor': ['person', 'dog', 'cat', 'bird', 'tree', 'bench'],
+    'dining': ['dining table', 'wine glass', 'cup', 'fork', 'knife', 'spoon'],
+    'bedroom': ['bed', 'teddy bear', 'clock', 'lamp'],
+}
+
+
+def build_index(rules):
+    """
+    Compile scene rules into label -> [(scene, weight)].
+    rules: {scene: [labels]} or {scene: {label: weight}}
+    """
+    index = collections.defaultdict(list)
+    for scene, labels in rules.items():
+        if isinstance(labels, dict):
+            weights = {label.lower(): float(w) for label, w in labels.items()}
+        else:
+            weights = {label.lower(): 1.0 / len(labels) for label in labels} if labels else {}
+        for label, weight in weights.items():
+            index[label].append((scene, weight))
+    return dict(index)
+
+
+class SceneSession:
+    """Recent frame scores of one client"""
+    def __init__(self, max_frames):
+        # (timestamp, {scene: score})
+        self.frames = collections.deque(maxlen=max_frames)
+        self.scene = None
+        self.last_seen = 0.0
+
+
+class SceneEngine:
+    def __init__(self, rules_path=None, window_seconds=10.0, max_frames=8, half_life_seconds=3.0,
+                 switch_margin=0.1, client_ttl_seconds=600.0):
+        self.rules_path = rules_path
+        self.window_seconds = window_seconds
+        self.max_frames = max_frames
+        self.half_life_seconds = half_life_seconds
+        # Relative lead another scene needs to replace the current label
+        self.switch_margin = switch_margin
+        self.client_ttl_seconds = client_ttl_seconds
+
+        self.rules = {}
+        self.index = {}
+        self._mtime = None
+        self._version = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+        self.frames = 0
+        self.switches = 0
+        # Frames whose own best scene differed from the smoothed label
+        self.smoothed_out = 0
+
+        self._load()
+
+    # ---------- rules ----------
+
+    def _load(self):
+        """Load (or reload) rules and rebuild the index"""
+        rules = DEFAULT_SCENE_RULES
+        mtime = None
+
+        if self.rules_path and os.path.exists(self.rules_path):
+            mtime = os.path.getmtime(self.rules_path)
+            try:
+                with open(self.rules_path, 'r', encoding='utf-8') as f:
+                    rules = json.load(f)
+            except Exception as e:
+                logger.error("Could not load scene rules", extra={"fields": {"path": self.rules_path, "error": str(e)}})
+                self._mtime = mtime  # keep the previous index until the file changes again
+                return
+
+        self.rules = rules
+        self.index = build_index(rules)
+        self._mtime = mtime
+        self._version += 1
+        logger.info("Loaded scene rules", extra={"fields": {"scenes": len(rules), "labels": len(self.index)}})
+
+    def _reload_if_changed(self):
+        if not self.rules_path:
+            return
+        mtime = os.path.getmtime(self.rules_path) if os.path.exists(self.rules_path) else None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load()
+
+    @property
+    def version(self):
+        self._reload_if_changed()
+        return self._version
+
+    # ---------- scoring ----------
+
+    def score_frame(self, labels):
+        """Rule-weighted score of every scene hit by a frame's labels"""
+        self._reload_if_changed()
+        index = self.index
+        scores = {}
+        for label in set(label.lower() for label in labels):
+            for scene, weight in index.get(label, ()):
+                scores[scene] = scores.get(scene, 0.0) + weight
+        return scores
+
+    @staticmethod
+    def _best(scores):
+        if not scores:
+            return ('general', 0.0)
+        best = max(scores, key=scores.get)
+        return (best, scores[best])
+
+    def infer(self, labels):
+        """
+        Scene of a single frame (no smoothing).
+        Returns: (scene_name, confidence)
+        """
+        if not labels:
+            return ('unknown', 0.0)
+        return self._best(self.score_frame(labels))
+
+    def observe(self, client_id, labels, now=None):
+        """
+        Add one frame of a client session and return the smoothed scene.
+        Returns: {"scene", "confidence", "frame_scene", "frame_confidence"}
+        """
+        now = time.time() if now is None else now
+        frame_scores = self.score_frame(labels)
+        frame_scene, frame_confidence = self._best(frame_scores) if labels else ('unknown', 0.0)
+
+        with self._lock:
+            session = self._sessions.get(client_id)
+            if session is None:
+                session = self._sessions[client_id] = SceneSession(self.max_frames)
+            session.last_seen = now
+            session.frames.append((now, frame_scores))
+            while session.frames and now - session.frames[0][0] > self.window_seconds:
+                session.frames.popleft()
+
+            smoothed = self._smoothed_scores(session, now)
+            best, best_score = self._best(smoothed)
+            current = session.scene
+            if current is not None and current != best and best != 'general':
+                # Keep the current label unless the new one clearly leads
+                if best_score < smoothed.get(current, 0.0) * (1.0 + self.switch_margin):
+                    best, best_score = current, smoothed.get(current, 0.0)
+            if current is not None and best != current:
+                self.switches += 1
+            session.scene = best
+
+            self.frames += 1
+            if frame_scene != best:
+                self.smoothed_out += 1
+            self._drop_idle_sessions(now)
+
+        return {
+            "scene": best,
+            "confidence": best_score,
+            "frame_scene": frame_scene,
+            "frame_confidence": frame_confidence
+        }
+
+    def _smoothed_scores(self, session, now):
+        """Recency-weighted mean of the window's frame scores"""
+        totals = {}
+        weight_sum = 0.0
+        for ts, scores in session.frames:
+            weight = 0.5 ** ((now - ts) / self.half_life_seconds) if self.half_life_seconds > 0 else 1.0
+            weight_sum += weight
+            for scene, score in scores.items():
+                totals[scene] = totals.get(scene, 0.0) + weight * score
+        if weight_sum == 0:
+            return {}
+        return {scene: total / weight_sum for scene, total in totals.items()}
+
+    def _drop_idle_sessions(self, now):
+        idle = [cid for cid, s in self._sessions.items() if now - s.last_seen > self.client_ttl_seconds]
+        for cid in idle:
+            del self._sessions[cid]
+
+    # ---------- stats ----------
+
+    def list_rules(self):
+        self._reload_if_changed()
+        return dict(self.rules)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "rules_version": self._version,
+                "frames": self.frames,
+                "label_switches": self.switches,
+                "smoothed_frames": self.smoothed_out,
+                "sessions": {cid: s.scene for cid, s in self._sessions.items()}
+            }
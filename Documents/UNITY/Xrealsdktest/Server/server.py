@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, abort, stream_with_context
 import os
 from datetime import datetime, timedelta
 import glob
@@ -6,9 +6,23 @@ import cv2
 import numpy as np
 import time
 import threading
-from ultralytics import YOLO
 from face_recognition_module import FaceRecognizer
 from object_recognition_module import ObjectRecognizer
+from result_cache import ResultCache
+from inference_profiles import InferenceProfiles
+from capture_archive import CaptureArchive
+from capture_storage import CaptureStorage
+from request_profiler import RequestProfiler
+from inference_context import InferenceContext, load_model
+from inference_pool import InferencePool, InferencePoolError
+from frame_decoding import read_frame, FrameFormatError
+from frame_tracker import StreamTracker
+from scene_engine import SceneEngine
+from latency_budget import LatencyBudget, BudgetStats
+from unity_log_store import UnityLogStore, parse_ts
+import json
+import structured_logging
+import atexit
 import logging
 
 app = Flask(__name__)
@@ -23,25 +37,164 @@ class LogFilter(logging.Filter):
 log = logging.getLogger('werkzeug')
 log.addFilter(LogFilter())
 
+# サーバー内部のログ（JSON Lines、別スレッドで非同期出力）
+logger = logging.getLogger('server')
+
 # Config
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
-UPLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'uploads')
-FACE_DATA_FOLDER = os.path.join(BASE_DIR, 'face_data')
+# SERVER_DATA_ROOT を指定すると保存データ（キャプチャ・登録データ・ログ・プロファイル）を
+# すべてその下に置く（負荷試験で本番データを汚さないため）
+DATA_ROOT = os.environ.get('SERVER_DATA_ROOT') or None
+UPLOAD_FOLDER = os.path.join(DATA_ROOT or PROJECT_ROOT, 'uploads')
+FACE_DATA_FOLDER = os.path.join(DATA_ROOT or BASE_DIR, 'face_data')
+ARCHIVE_FOLDER = os.path.join(DATA_ROOT or PROJECT_ROOT, 'uploads_archive')
+PROFILES_FOLDER = os.path.join(DATA_ROOT or BASE_DIR, 'profiles')
 
 # クリーンアップ設定
 IMAGE_MAX_AGE_HOURS = 24  # 画像の最大保持時間（時間）
 CLEANUP_INTERVAL_SECONDS = 3600  # クリーンアップ間隔（1時間 = 3600秒）
 
+# アーカイブ設定（古いキャプチャを日別パックファイルにまとめる）
+ARCHIVE_AFTER_HOURS = 1  # この時間を過ぎたキャプチャをパックへ移動
+
+# 識別結果キャッシュ設定（同一フレームの再送・再タップ対策）
+RESULT_CACHE_MAX_ENTRIES = 256  # 0 でキャッシュ無効
+RESULT_CACHE_TTL_SECONDS = 60
+
+# YOLOモデル（キャッシュキーのモデルバージョンにも使用）
+YOLO_MODEL_PATH = 'yolov8n.pt'
+
+# SERVER_STUB_MODELS=1 で重みファイル不要のスタブモデルを使用（負荷試験用）
+SERVER_STUB_MODELS = os.environ.get('SERVER_STUB_MODELS') == '1'
+
+# 登録物体の事前絞り込み（Bag-of-Visual-Words で上位K件のみ詳細マッチング）
+OBJECT_PREFILTER_TOP_K = 5  # 0 で無効（全物体と照合）
+
+# リクエストプロファイリング設定
+# 許可クライアントが "X-Profile: 1" ヘッダー（または ?profile=1）を付けたリクエストを計測
+PROFILE_ALLOWED_CLIENTS = ['127.0.0.1']
+PROFILE_SAMPLE_EVERY_N = 0  # N件に1件を自動計測（0 で無効）
+PROFILE_MAX_TOTAL_MB = 100  # 保存するプロファイルの合計上限
+
+# 複数フレーム一括登録時の特徴抽出・顔検出ワーカー数
+SAMPLE_EXTRACTION_WORKERS = 4
+
+# エンドポイント毎の推論プロファイル（クラス・画像サイズ・閾値）
+INFERENCE_PROFILES_PATH = os.path.join(BASE_DIR, 'inference_profiles.json')
+
+# ORB特徴抽出プロファイル（登録は高密度、/stream は軽量）
+ORB_PROFILES_PATH = os.path.join(BASE_DIR, 'orb_profiles.json')
+
+# 生フレーム（RGB/BGR/RGBA/NV12 等）受信時、保存するフレームだけをこの品質でJPEG化
+RAW_FRAME_JPEG_QUALITY = 90
+
+# 保存キャプチャの再エンコード方針（バックグラウンドで縮小・低品質化）
+CAPTURE_REENCODE_ENABLED = True  # False で従来通りアップロードのまま保存
+CAPTURE_MAX_DIM = 1280  # 長辺の上限（px）
+CAPTURE_JPEG_QUALITY = 75
+CAPTURE_FULL_QUALITY_SOURCES = ['custom', 'face']  # これらの検出を含むフレームは元の品質で保存
+CAPTURE_ENCODE_QUEUE_SIZE = 32  # 満杯時はリクエスト内でエンコード
+
+# /stream 保存抑制（クライアント毎の物体トラッキング）
+# 新しい物体の出現・シーン変化・キープアライブ時のみ保存し、それ以外は "suppressed"
+STREAM_TRACKING_ENABLED = True
+TRACK_IOU_THRESHOLD = 0.3  # 同一トラックとみなす IoU
+TRACK_MAX_MISSED_SECONDS = 3.0  # この時間見えなければトラック終了（再出現は新規扱い）
+STREAM_KEEPALIVE_SECONDS = 60  # 変化がなくてもこの間隔で1枚保存
+
+# シーン推定（scene_rules.json、変更時のみインデックス再構築）
+SCENE_RULES_PATH = os.path.join(BASE_DIR, 'scene_rules.json')
+SCENE_WINDOW_SECONDS = 10  # クライアント毎に直近この時間のフレームで平滑化
+SCENE_WINDOW_FRAMES = 8  # 平滑化に使う最大フレーム数
+SCENE_HALF_LIFE_SECONDS = 3  # 古いフレームの重みが半分になる時間
+SCENE_SWITCH_MARGIN = 0.1  # 現在のシーンをこの割合以上上回ったら切り替え（ちらつき防止）
+
+# /stream のレイテンシ予算（ヘッダ X-Latency-Budget-Ms で上書き可）
+# 予算を使い切ったらカスタム物体照合などの任意ステージを省略・打ち切り
+STREAM_LATENCY_BUDGET_MS = 500  # 0 で無制限（全ステージ実行）
+STREAM_LATENCY_BUDGET_MAX_MS = 5000  # クライアント指定の上限
+
+# ログ設定（キュー経由で非同期にJSON Linesを出力、満杯時は破棄して件数を記録）
+LOG_LEVEL = 'INFO'  # DEBUG にすると検出ごとの詳細ログも出力
+LOG_MODULE_LEVELS = {}  # モジュール毎のレベル 例: {'object_recognition_module': 'DEBUG'}
+LOG_FILE = None  # 例: os.path.join(BASE_DIR, 'server_log.jsonl')（None で標準出力のみ）
+LOG_QUEUE_SIZE = 10000
+
+# Unityログ保存設定（セグメント分割 + gzip圧縮 + インデックス）
+UNITY_LOG_FOLDER = os.path.join(DATA_ROOT or BASE_DIR, 'unity_logs')
+UNITY_LOG_SEGMENT_MAX_MB = 4  # このサイズを超えたら次のセグメントへ
+UNITY_LOG_SEGMENT_MAX_SECONDS = 3600  # この時間を過ぎたら次のセグメントへ
+UNITY_LOG_RETENTION_DAYS = 30  # これより古いセグメントを削除
+UNITY_LOG_QUERY_MAX_RESULTS = 10000  # /logs/query の1回あたり上限
+
+# 推論ワーカープロセス設定（各プロセスがYOLO・認識器を個別に保持）
+INFERENCE_WORKERS = 0  # ワーカープロセス数（0 で無効、従来通りリクエストスレッドで推論）
+INFERENCE_THREADS_PER_WORKER = 1  # ワーカー毎の OpenCV/BLAS/torch スレッド数
+INFERENCE_MAX_FRAME_BYTES = 1920 * 1080 * 4  # 共有メモリ1スロットの大きさ（デコード済みフレーム上限）
+INFERENCE_TASK_TIMEOUT_SECONDS = 30  # これを超えたワーカーは強制終了して再起動
+INFERENCE_RESTART_WORKERS = True  # 停止したワーカーを自動再起動
+
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+structured_logging.setup_logging(
+    LOG_LEVEL, log_file=LOG_FILE, queue_size=LOG_QUEUE_SIZE, module_levels=LOG_MODULE_LEVELS
+)
+
+# リクエスト単位のプロファイラ
+request_profiler = RequestProfiler(
+    PROFILES_FOLDER,
+    allowed_clients=PROFILE_ALLOWED_CLIENTS,
+    sample_every=PROFILE_SAMPLE_EVERY_N,
+    max_total_bytes=PROFILE_MAX_TOTAL_MB * 1024 * 1024
+)
+request_profiler.install(app)
+
+# 日別パックアーカイブ（作業用ファイルは対象外）
+capture_archive = CaptureArchive(
+    UPLOAD_FOLDER, ARCHIVE_FOLDER,
+    archive_after_hours=ARCHIVE_AFTER_HOURS,
+    skip_names=("debug_latest_no_detection.jpg",)
+)
+
+# Unityログストア（旧 unity_logs.txt があれば一度だけ取り込む）
+unity_log_store = UnityLogStore(
+    UNITY_LOG_FOLDER,
+    segment_max_bytes=UNITY_LOG_SEGMENT_MAX_MB * 1024 * 1024,
+    segment_max_seconds=UNITY_LOG_SEGMENT_MAX_SECONDS
+)
+unity_log_store.import_legacy(os.path.join(DATA_ROOT or BASE_DIR, 'unity_logs.txt'))
+atexit.register(unity_log_store.close)
+
+# 保存キャプチャのエンコード（縮小・品質の段階分け）
+capture_storage = CaptureStorage(
+    UPLOAD_FOLDER,
+    max_dim=CAPTURE_MAX_DIM,
+    quality=CAPTURE_JPEG_QUALITY,
+    full_quality=RAW_FRAME_JPEG_QUALITY,
+    keep_full_sources=CAPTURE_FULL_QUALITY_SOURCES,
+    queue_size=CAPTURE_ENCODE_QUEUE_SIZE,
+    enabled=CAPTURE_REENCODE_ENABLED
+)
+atexit.register(capture_storage.close)
+
 def cleanup_old_images():
     """
-    24時間以上経過した画像を削除
+    古い画像を日別パックへ移動し、24時間以上経過したパックを丸ごと削除
     """
     while True:
         try:
+            # 1. 古いキャプチャをパックへ移動
+            archived_count = capture_archive.archive_old_captures()
+            if archived_count > 0:
+                logger.info("Archived captures into day packs", extra={"fields": {"archived": archived_count}})
+            
+            # 2. 保持期間を過ぎたパックを丸ごと削除
+            for day in capture_archive.drop_old_packs(IMAGE_MAX_AGE_HOURS):
+                logger.info("Dropped archive pack", extra={"fields": {"day": day}})
+            
+            # 3. パック化されずに残った古い画像を削除
             now = time.time()
             max_age_seconds = IMAGE_MAX_AGE_HOURS * 3600
             deleted_count = 0
@@ -51,15 +204,16 @@ def cleanup_old_images():
                 if file_age > max_age_seconds:
                     os.remove(filepath)
                     deleted_count += 1
-                    print(f"[CLEANUP] Deleted old image: {os.path.basename(filepath)}")
+                    logger.debug("Deleted old image", extra={"fields": {"filename": os.path.basename(filepath)}})
             
-            if deleted_count > 0:
-                print(f"[CLEANUP] Deleted {deleted_count} old images")
-            else:
-                print(f"[CLEANUP] No old images to delete (checked at {datetime.now().strftime('%H:%M:%S')})")
+            logger.info("Cleanup finished", extra={"fields": {"deleted": deleted_count}})
+            
+            # 4. 保持期間を過ぎたUnityログセグメントを削除
+            for segment in unity_log_store.drop_old_segments(UNITY_LOG_RETENTION_DAYS):
+                logger.info("Dropped Unity log segment", extra={"fields": {"segment": segment}})
                 
-        except Exception as e:
-            print(f"[CLEANUP] Error: {e}")
+        except Exception:
+            logger.exception("Cleanup failed")
         
         # 次のクリーンアップまで待機
         time.sleep(CLEANUP_INTERVAL_SECONDS)
@@ -69,11 +223,33 @@ cleanup_thread = threading.Thread(target=cleanup_old_images, daemon=True)
 cleanup_thread.start()
 print(f"[CLEANUP] Auto-cleanup thread started (every {CLEANUP_INTERVAL_SECONDS//3600}h, max age: {IMAGE_MAX_AGE_HOURS}h)")
 
+OBJECT_DATA_FOLDER = os.path.join(DATA_ROOT or BASE_DIR, 'object_data')
+
+# Everything an inference worker process needs to build its own models
+INFERENCE_WORKER_CONFIG = {
+    "stub_models": SERVER_STUB_MODELS,
+    "model_path": YOLO_MODEL_PATH,
+    "profiles_path": INFERENCE_PROFILES_PATH,
+    "orb_profiles_path": ORB_PROFILES_PATH,
+    "object_data_dir": OBJECT_DATA_FOLDER,
+    "face_data_dir": FACE_DATA_FOLDER,
+    "prefilter_top_k": OBJECT_PREFILTER_TOP_K,
+    "log_level": LOG_LEVEL
+}
+
 # Load YOLOv8 model
-print("Loading YOLOv8 model...")
-model = YOLO('yolov8n.pt')
+if SERVER_STUB_MODELS:
+    print("Loading stub model (SERVER_STUB_MODELS=1)...")
+    MODEL_VERSION = 'stub'
+else:
+    print("Loading YOLOv8 model...")
+    MODEL_VERSION = YOLO_MODEL_PATH
+model = load_model(INFERENCE_WORKER_CONFIG)
 print("Model loaded!")
 
+# Per-endpoint inference settings, passed directly into model(...)
+inference_profiles = InferenceProfiles(INFERENCE_PROFILES_PATH, model.names)
+
 # Initialize Face Recognizer
 print("Initializing Face Recognizer...")
 face_recognizer = FaceRecognizer(data_dir=FACE_DATA_FOLDER)
@@ -81,51 +257,88 @@ print("Face Recognizer ready!")
 
 # Initialize Object Recognizer
 print("Initializing Object Recognizer...")
-OBJECT_DATA_FOLDER = os.path.join(BASE_DIR, 'object_data')
-object_recognizer = ObjectRecognizer(data_dir=OBJECT_DATA_FOLDER)
+object_recognizer = ObjectRecognizer(data_dir=OBJECT_DATA_FOLDER, prefilter_top_k=OBJECT_PREFILTER_TOP_K,
+                                     orb_profiles_path=ORB_PROFILES_PATH)
 print(f"Object Recognizer ready! ({len(object_recognizer.get_registered_names())} objects registered)")
 
-# シーン認識のルール（検出物体からシーンを推測）
-SCENE_RULES = {
-    'office': ['laptop', 'keyboard', 'mouse', 'monitor', 'book', 'chair', 'desk'],
-    'kitchen': ['cup', 'bottle', 'bowl', 'fork', 'knife', 'spoon', 'microwave', 'oven', 'refrigerator', 'sink'],
-    'livingroom': ['couch', 'tv', 'remote', 'potted plant', 'clock', 'vase'],
-    'street': ['car', 'truck', 'bus', 'motorcycle', 'bicycle', 'traffic light', 'stop sign'],
-    'outdoor': ['person', 'dog', 'cat', 'bird', 'tree', 'bench'],
-    'dining': ['dining table', 'wine glass', 'cup', 'fork', 'knife', 'spoon'],
-    'bedroom': ['bed', 'teddy bear', 'clock', 'lamp'],
-}
+# Identify result cache (keyed by image hash + catalog/model versions)
+result_cache = ResultCache(max_entries=RESULT_CACHE_MAX_ENTRIES, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+
+# Per-client tracker deciding which /stream frames are worth saving
+stream_tracker = StreamTracker(
+    iou_threshold=TRACK_IOU_THRESHOLD,
+    max_missed_seconds=TRACK_MAX_MISSED_SECONDS,
+    keepalive_seconds=STREAM_KEEPALIVE_SECONDS
+)
+
+# クライアント毎に平滑化するシーン推定
+scene_engine = SceneEngine(
+    SCENE_RULES_PATH,
+    window_seconds=SCENE_WINDOW_SECONDS,
+    max_frames=SCENE_WINDOW_FRAMES,
+    half_life_seconds=SCENE_HALF_LIFE_SECONDS,
+    switch_margin=SCENE_SWITCH_MARGIN
+)
+
+# /stream のレイテンシ予算の使用状況
+budget_stats = BudgetStats()
+
+# In-process inference (also the fallback when the worker pool cannot take a task)
+inference_context = InferenceContext(model, inference_profiles, object_recognizer, face_recognizer)
+
+inference_pool = None
+if INFERENCE_WORKERS > 0:
+    print(f"Starting {INFERENCE_WORKERS} inference worker process(es)...")
+    inference_pool = InferencePool(
+        INFERENCE_WORKER_CONFIG,
+        num_workers=INFERENCE_WORKERS,
+        threads_per_worker=INFERENCE_THREADS_PER_WORKER,
+        max_frame_bytes=INFERENCE_MAX_FRAME_BYTES,
+        task_timeout=INFERENCE_TASK_TIMEOUT_SECONDS,
+        restart_workers=INFERENCE_RESTART_WORKERS
+    )
+    atexit.register(inference_pool.close)
+
+def run_inference(kind, image, **kwargs):
+    """
+    Run an InferenceContext routine on the worker pool if enabled,
+    otherwise (or if the pool cannot take it) in this thread.
+    """
+    if inference_pool is not None and inference_pool.ready_workers > 0:
+        try:
+            return inference_pool.run(kind, image, **kwargs)
+        except InferencePoolError as e:
+            logger.warning("Inference fell back to in-process", extra={"fields": {"kind": kind, "error": str(e)}})
+    return getattr(inference_context, kind)(image, **kwargs)
 
-def infer_scene(detected_objects):
+def request_budget():
     """
-    検出された物体からシーンを推測
-    Returns: (scene_name, confidence)
+    /stream のレイテンシ予算（ms、None は無制限）。クライアント指定は上限で丸める
+    Raises: ValueError
     """
-    if not detected_objects:
-        return ('unknown', 0.0)
-    
-    detected_set = set(obj.lower() for obj in detected_objects)
-    
-    scene_scores = {}
-    for scene, keywords in SCENE_RULES.items():
-        matches = detected_set.intersection(set(keywords))
-        if matches:
-            # スコアはマッチした数 / キーワード総数
-            score = len(matches) / len(keywords)
-            scene_scores[scene] = score
-    
-    if not scene_scores:
-        return ('general', 0.0)
-    
-    # 最高スコアのシーンを返す
-    best_scene = max(scene_scores, key=scene_scores.get)
-    return (best_scene, scene_scores[best_scene])
+    value = request.headers.get('X-Latency-Budget-Ms')
+    if value in (None, ''):
+        return STREAM_LATENCY_BUDGET_MS or None
+    try:
+        budget_ms = float(value)
+    except ValueError:
+        raise ValueError("X-Latency-Budget-Ms must be a number")
+    if budget_ms < 0:
+        raise ValueError("X-Latency-Budget-Ms must not be negative")
+    if budget_ms == 0:
+        return None  # 0 で無制限
+    return min(budget_ms, STREAM_LATENCY_BUDGET_MAX_MS)
+
+def notify_catalog_changed(catalog, result):
+    """Let worker processes reload a catalog after a successful change"""
+    if inference_pool is not None and result.get("success"):
+        inference_pool.notify_catalog_changed(catalog)
 
 # ============ Unity Log Forwarding Endpoint ============
 @app.route('/log', methods=['POST'])
 def receive_unity_log():
     """
-    Unityからのコンソールログを受信してファイルに保存
+    Unityからのコンソールログを受信してログストアに保存
     """
     try:
         data = request.get_json()
@@ -136,149 +349,167 @@ def receive_unity_log():
         message = data.get('message', '')
         stack = data.get('stack', '')
         
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_file = os.path.join(BASE_DIR, 'unity_logs.txt')
-        
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(f"[{timestamp}] [{log_type}] {message}\n")
-            if stack:
-                f.write(f"    Stack: {stack[:200]}\n")  # スタックトレースは200文字まで
+        unity_log_store.append(log_type, message, stack)  # スタックトレースは200文字まで
         
         # コンソールにも出力（ただしLogタイプは省略して重要なもののみ）
         if log_type in ['Error', 'Exception', 'Warning']:
-            print(f"[UNITY-{log_type}] {message[:100]}")
+            logger.warning("Unity log", extra={"fields": {"unity_type": log_type, "unity_message": message[:100]}})
         
         return jsonify({'status': 'ok'})
     except Exception as e:
-        print(f"[ERROR] Log receive failed: {e}")
+        logger.exception("Log receive failed")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/logs/query', methods=['GET'])
+def query_unity_logs():
+    """
+    Unityログの検索（該当セグメントのみ読み、JSON Linesでストリーミング返却）
+    パラメータ: start, end（ISO 8601 またはエポック秒）, type（カンマ区切り）, q（部分一致）, limit
+    """
+    try:
+        start = parse_ts(request.args.get('start'))
+        end = parse_ts(request.args.get('end'))
+        limit = int(request.args.get('limit', UNITY_LOG_QUERY_MAX_RESULTS))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    limit = min(limit, UNITY_LOG_QUERY_MAX_RESULTS)
+    types = [t for t in request.args.get('type', '').split(',') if t]
+    contains = request.args.get('q') or None
+
+    records = unity_log_store.query(start=start, end=end, types=types, contains=contains, limit=limit)
+
+    def generate():
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/logs/stats', methods=['GET'])
+def unity_log_stats():
+    """Unityログストアの統計"""
+    return jsonify(unity_log_store.get_stats())
+
 @app.route('/stream', methods=['POST'])
 def stream_frame():
     """
-    Receives a frame from Unity, runs inference.
+    Receives a frame from Unity (JPEG or raw pixels), runs inference.
     If objects are detected, saves the image.
     Otherwise, discards it.
+    Optional stages are skipped when the latency budget is spent;
+    the response lists every stage in "stages".
     """
-    if 'image' not in request.files:
-        return jsonify({"error": "No image part"}), 400
-    
-    file = request.files['image']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
+    try:
+        budget = LatencyBudget(request_budget())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # 1. Save temporarily for inference
-    temp_path = os.path.join(UPLOAD_FOLDER, "temp_stream.jpg")
-    file.save(temp_path)
+    # 1. Decode in memory (raw frames are wrapped without copying)
+    try:
+        with budget.stage("decode"):
+            frame = read_frame(request)
+            if frame is None:
+                return jsonify({"error": "No image part"}), 400
+            img_cv2 = frame.image
+    except FrameFormatError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        # 2. Run Inference (YOLO)
-        # conf=0.6: Higher threshold for precision (reduce false positives)
-        results = model(temp_path, conf=0.6)
-        
-        detailed_objects = []
-        detected_names = []
-        
-        # YOLO Detections
-        for r in results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                name = model.names[cls_id]
-                conf = float(box.conf[0])
-                # Return normalized coordinates (0-1)
-                xyxyn = box.xyxyn[0].tolist() # [x1, y1, x2, y2]
-                
-                detailed_objects.append({
-                    "name": name,
-                    "confidence": round(conf, 2),
-                    "box": xyxyn,
-                    "source": "yolo"
-                })
-                detected_names.append(name)
-        
-        # =================================================
-        # Custom Object Recognition (SIFT/ORB)
-        # =================================================
-        img_cv2 = cv2.imread(temp_path)
-        if img_cv2 is not None:
-            # Check custom registered objects
-            custom_result = object_recognizer.identify_objects(img_cv2, min_matches=10) # Lower matches for streaming
-            
-            if custom_result["success"] and len(custom_result["objects"]) > 0:
-                for obj in custom_result["objects"]:
-                    custom_name = obj["name"]
-                    # confidence in this module is match_count, so we might need to normalize or just use it
-                    # But the return format is {"name": name, "confidence": match_count}
-                    custom_conf = float(obj["confidence"]) 
-                    
-                    # Prevent duplicates if YOLO also found it (unlikely for custom objects but possible)
-                    if custom_name not in detected_names:
-                        detailed_objects.append({
-                            "name": custom_name,
-                            "confidence": custom_conf, # This is match count, usually > 10
-                            "box": [0.4, 0.4, 0.6, 0.6], # Dummy center box
-                            "source": "custom"
-                        })
-                        detected_names.append(custom_name)
-                        print(f"[Custom Object] Found: {custom_name} (Matches: {custom_conf})")
-        # =================================================
+        # 2. Run Inference (YOLO 'stream' profile + custom ORB objects within the budget)
+        detailed_objects, detected_names, stages = run_inference(
+            'detect_stream', img_cv2, budget_ms=budget.remaining_ms())
+        budget.extend(stages)
 
         # Unique names for scene inference and summary
         detected_names_unique = list(set(detected_names))
         detected_objects = detected_names_unique # Restore variable for compatibility
 
         if len(detected_objects) > 0:
-            # シーン認識
-            scene, scene_confidence = infer_scene(detected_objects)
+            client_id = request.headers.get('X-Client-Id') or request.remote_addr
+            
+            # シーン認識（クライアント毎の直近フレームで平滑化）
+            with budget.stage("scene"):
+                scene_result = scene_engine.observe(client_id, detected_objects)
+            scene, scene_confidence = scene_result["scene"], scene_result["confidence"]
+            
+            # トラッキング: 新しい物体・シーン変化・キープアライブ以外は保存しない
+            if STREAM_TRACKING_ENABLED:
+                with budget.stage("tracking"):
+                    decision = stream_tracker.observe(client_id, detailed_objects, scene)
+                for det, track_id in zip(detailed_objects, decision["track_ids"]):
+                    det["track_id"] = track_id
+                
+                if not decision["save"]:
+                    budget_stats.record(budget)
+                    return jsonify({
+                        "status": "suppressed",
+                        "objects": detected_objects,
+                        "detections": detailed_objects,
+                        "scene": scene,
+                        "scene_confidence": round(scene_confidence, 2),
+                        "frame_scene": scene_result["frame_scene"],
+                        "track_ids": decision["track_ids"],
+                        "stages": budget.stages,
+                        "budget": budget.to_dict()
+                    })
+            else:
+                decision = {"reason": None, "track_ids": []}
             
             # Create a filename that includes timestamp and detected objects
             # Format: YYYYMMDD_HHMMSS_scene_obj1_obj2.jpg
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             objects_str = "_".join(detected_objects)
             save_filename = f"{timestamp}_{scene}_{objects_str}.jpg"
-            save_path = os.path.join(UPLOAD_FOLDER, save_filename)
             
-            # Rename temp file to permanent file
-            if os.path.exists(save_path):
-                os.remove(save_path)
-            # Re-read image to save ensures we don't have file lock issues with rename
-            # or just use rename if safer. Window os.rename has limitations if dest exists.
-            if os.path.exists(temp_path): # Ensure temp path exists
-                if os.path.exists(save_path): os.remove(save_path)
-                os.rename(temp_path, save_path)
+            # Custom objects / faces: full quality now; others: downscaled in the background
+            with budget.stage("save"):
+                storage_tier = capture_storage.save(save_filename, frame, detailed_objects)
             
-            print(f"[SAVED] {save_filename} (Scene: {scene}, Found: {objects_str})")
+            logger.info("Saved capture", extra={"fields": {
+                "filename": save_filename, "scene": scene, "reason": decision["reason"], "tier": storage_tier}})
+            budget_stats.record(budget)
             return jsonify({
                 "status": "saved",
                 "objects": detected_objects,
                 "detections": detailed_objects,
                 "scene": scene,
                 "scene_confidence": round(scene_confidence, 2),
-                "filename": save_filename
+                "frame_scene": scene_result["frame_scene"],
+                "filename": save_filename,
+                "track_ids": decision["track_ids"],
+                "save_reason": decision["reason"],
+                "storage": storage_tier,
+                "stages": budget.stages,
+                "budget": budget.to_dict()
             })
         else:
             # Debug: Save the latest failed image to check content
             # Nothing interesting, discard
-            debug_path = os.path.join(UPLOAD_FOLDER, "debug_latest_no_detection.jpg")
-            if os.path.exists(debug_path):
-                os.remove(debug_path)
-            if os.path.exists(temp_path):
-                os.rename(temp_path, debug_path)
+            # (raw frames are not encoded just for the debug copy)
+            debug_saved = frame.format in ('jpeg', 'jpg')
+            if debug_saved:
+                debug_path = os.path.join(UPLOAD_FOLDER, "debug_latest_no_detection.jpg")
+                with open(debug_path, 'wb') as f:
+                    f.write(frame.data)
                 
-            # Log brightness
-            if img_cv2 is not None:
-                avg_brightness = np.mean(img_cv2)
-                print(f"[DEBUG] No detection. Image Brightness: {avg_brightness:.2f} (saved to debug_latest_no_detection.jpg)")
+            # Log brightness (np.mean over the frame only when debug logging is on)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("No detection", extra={"fields": {
+                    "brightness": round(float(np.mean(img_cv2)), 2), "debug_saved": debug_saved}})
             
+            budget_stats.record(budget)
             return jsonify({
                 "status": "discarded",
                 "objects": [],
                 "scene": "unknown",
-                "debug_info": "saved_to_debug_latest"
+                "debug_info": "saved_to_debug_latest" if debug_saved else "not_saved_raw_frame",
+                "stages": budget.stages,
+                "budget": budget.to_dict()
             })
 
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Stream processing failed")
         return jsonify({"error": str(e)}), 500
 
 # ============ FACE RECOGNITION ENDPOINTS ============
@@ -309,7 +540,33 @@ def register_face():
     
     # Register face
     result = face_recognizer.register_face(image, name)
+    notify_catalog_changed('faces', result)
+    
+    return jsonify(result)
+
+@app.route('/register_faces', methods=['POST'])
+def register_faces():
+    """
+    Register many face images for one person in a single batch.
+    Expects: multipart form with 'name' and one or more 'images' files.
+    The model is retrained once; rejected images are reported with a reason.
+    """
+    name = request.form.get('name', '').strip()
+    if not name:
+        return jsonify({"error": "No name provided"}), 400
+    
+    files = request.files.getlist('images')
+    if not files:
+        return jsonify({"error": "No images provided"}), 400
     
+    # Undecodable images stay as None and are reported as rejected
+    images = []
+    for file in files:
+        file_bytes = np.frombuffer(file.read(), np.uint8)
+        images.append(cv2.imdecode(file_bytes, cv2.IMREAD_COLOR) if file_bytes.size > 0 else None)
+    
+    result = face_recognizer.register_faces(images, name, max_workers=SAMPLE_EXTRACTION_WORKERS)
+    notify_catalog_changed('faces', result)
     return jsonify(result)
 
 @app.route('/identify_faces', methods=['POST'])
@@ -318,27 +575,34 @@ def identify_faces():
     Identify faces in an image.
     Returns list of detected faces with names and bounding boxes.
     """
-    if 'image' not in request.files:
+    try:
+        frame = read_frame(request)
+    except FrameFormatError as e:
+        return jsonify({"error": str(e)}), 400
+    if frame is None:
         return jsonify({"error": "No image part"}), 400
     
-    file = request.files['image']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
-    
-    # Read image from file
-    file_bytes = np.frombuffer(file.read(), np.uint8)
-    image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
+    # Same frame + same enrolled persons -> reuse previous result
+    cache_key = ResultCache.make_key('identify_faces', frame.data, face_recognizer.version, frame.cache_tag)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
     
-    if image is None:
-        return jsonify({"error": "Could not read image"}), 400
+    # JPEG decode / raw pixel conversion (only on a cache miss)
+    try:
+        image = frame.image
+    except FrameFormatError as e:
+        return jsonify({"error": str(e)}), 400
     
     # Identify faces
-    faces = face_recognizer.identify_faces(image)
+    faces = run_inference('identify_faces', image)
     
-    return jsonify({
+    result = {
         "faces": faces,
         "count": len(faces)
-    })
+    }
+    result_cache.put(cache_key, result)
+    return jsonify(result)
 
 @app.route('/list_persons', methods=['GET'])
 def list_persons():
@@ -361,6 +625,7 @@ def delete_person():
         return jsonify({"error": "No name provided"}), 400
     
     result = face_recognizer.delete_person(name)
+    notify_catalog_changed('faces', result)
     return jsonify(result)
 
 # ============ OBJECT RECOGNITION ENDPOINTS ============
@@ -386,6 +651,7 @@ def register_object():
         return jsonify({"error": "Invalid image"}), 400
     
     result = object_recognizer.register_object(image, name)
+    notify_catalog_changed('objects', result)
     return jsonify(result)
 
 @app.route('/objects/add_sample', methods=['POST'])
@@ -394,18 +660,16 @@ def add_object_sample():
     Add a sample image to an object (for multi-image registration).
     Call this multiple times during registration to build up features.
     """
-    print("[DEBUG] /objects/add_sample called!")  # デバッグログ
-    
     if 'image' not in request.files:
-        print("[DEBUG] No image in request!")
+        logger.debug("add_sample without image")
         return jsonify({"error": "No image provided"}), 400
     
     name = request.form.get('name', '')
     if not name:
-        print("[DEBUG] No name provided!")
+        logger.debug("add_sample without name")
         return jsonify({"error": "No name provided"}), 400
     
-    print(f"[DEBUG] Registering object: {name}")
+    logger.debug("add_sample", extra={"fields": {"name": name}})
     
     file = request.files['image']
     np_arr = np.frombuffer(file.read(), np.uint8)
@@ -415,6 +679,32 @@ def add_object_sample():
         return jsonify({"error": "Invalid image"}), 400
     
     result = object_recognizer.add_sample_to_object(image, name)
+    notify_catalog_changed('objects', result)
+    return jsonify(result)
+
+@app.route('/objects/add_samples', methods=['POST'])
+def add_object_samples():
+    """
+    Add many sample images to an object in one upload.
+    Expects: multipart form with 'name' and one or more 'images' files.
+    Features are extracted in parallel and persisted once.
+    """
+    name = request.form.get('name', '')
+    if not name:
+        return jsonify({"error": "No name provided"}), 400
+    
+    files = request.files.getlist('images')
+    if not files:
+        return jsonify({"error": "No images provided"}), 400
+    
+    # Undecodable frames stay as None and are reported per frame
+    images = []
+    for file in files:
+        np_arr = np.frombuffer(file.read(), np.uint8)
+        images.append(cv2.imdecode(np_arr, cv2.IMREAD_COLOR) if np_arr.size > 0 else None)
+    
+    result = object_recognizer.add_samples_to_object(images, name, max_workers=SAMPLE_EXTRACTION_WORKERS)
+    notify_catalog_changed('objects', result)
     return jsonify(result)
 
 @app.route('/objects/identify', methods=['POST'])
@@ -422,55 +712,32 @@ def identify_objects():
     """
     Identify registered objects in an image.
     """
-    if 'image' not in request.files:
+    try:
+        frame = read_frame(request)
+    except FrameFormatError as e:
+        return jsonify({"error": str(e)}), 400
+    if frame is None:
         return jsonify({"error": "No image provided"}), 400
     
-    file = request.files['image']
-    np_arr = np.frombuffer(file.read(), np.uint8)
-    image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-    
-    if image is None:
-        return jsonify({"error": "Invalid image"}), 400
-    
-    result = object_recognizer.identify_objects(image)
+    # Same frame + same catalog + same YOLO weights -> reuse previous result
+    cache_key = ResultCache.make_key('objects_identify', frame.data,
+                                     object_recognizer.version, MODEL_VERSION,
+                                     inference_profiles.version, object_recognizer.orb_profiles.version,
+                                     frame.cache_tag)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
     
-    # Also run YOLO for common objects (Pre-registered)
+    # JPEG decode / raw pixel conversion (only on a cache miss)
     try:
-        yolo_results = model(image, conf=0.5, verbose=False)
-        common_target = [
-            "person", "bicycle", "car", "dog", "cat", 
-            "backpack", "umbrella", "bottle", "cup", "fork", 
-            "spoon", "bowl", "chair", "laptop", "cell phone"
-        ]
-        
-        yolo_found = []
-        for r in yolo_results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                name = model.names[cls_id]
-                conf = float(box.conf[0])
-                
-                if name in common_target:
-                    # Get normalized box coordinates [x1, y1, x2, y2]
-                    xyxyn = box.xyxyn[0].tolist()
-                    
-                    # Add to results
-                    result['objects'].append({
-                        "name": name,
-                        "confidence": round(conf, 2),
-                        "matches": 999,
-                        "box": xyxyn
-                    })
-                    yolo_found.append(name)
-        
-        # Sort combined results by confidence
-        result['objects'].sort(key=lambda x: x['confidence'], reverse=True)
-        if yolo_found:
-            result['message'] += f" (+{len(yolo_found)} common items)"
-            
-    except Exception as e:
-        print(f"YOLO Identify Error: {e}")
+        image = frame.image
+    except FrameFormatError as e:
+        return jsonify({"error": "Invalid image" if frame.is_encoded else str(e)}), 400
+    
+    # Registered objects + YOLO common objects ('identify' profile)
+    result = run_inference('identify_objects', image)
 
+    result_cache.put(cache_key, result)
     return jsonify(result)
 
 @app.route('/objects/list', methods=['GET'])
@@ -478,9 +745,8 @@ def list_objects():
     """
     List all registered objects.
     """
-    print("[API] /objects/list called!")
     result = object_recognizer.list_objects()
-    print(f"[API] Returning {len(result.get('objects', []))} objects")
+    logger.debug("Listing objects", extra={"fields": {"count": len(result.get('objects', []))}})
     return jsonify(result)
 
 @app.route('/objects/delete', methods=['POST'])
@@ -493,6 +759,7 @@ def delete_object():
         return jsonify({"error": "No name provided"}), 400
     
     result = object_recognizer.delete_object(name)
+    notify_catalog_changed('objects', result)
     return jsonify(result)
 
 # ============ EXISTING ENDPOINTS ============
@@ -509,15 +776,16 @@ def search_history():
 
     # 複数カテゴリ対応（カンマ区切り）
     categories = [c.strip() for c in query.split(',') if c.strip()]
-    print(f"Searching for: {categories}")
+    logger.debug("Search", extra={"fields": {"categories": categories}})
     
     # Simple search: look at filenames
     # Filename format: YYYYMMDD_HHMMSS_obj1_obj2.jpg
-    all_files = sorted(glob.glob(os.path.join(UPLOAD_FOLDER, "*.jpg")), reverse=True)
+    # Loose captures plus those already packed into the day archives
+    all_names = set(os.path.basename(p) for p in glob.glob(os.path.join(UPLOAD_FOLDER, "*.jpg")))
+    all_names.update(capture_archive.list_names())
     
     matches = []
-    for filepath in all_files:
-        filename = os.path.basename(filepath)
+    for filename in sorted(all_names, reverse=True):
         filename_lower = filename.lower()
         
         # "all" を含む場合はすべてマッチ
@@ -555,6 +823,76 @@ def search_history():
         "results": matches
     })
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Identify result cache hit/miss statistics"""
+    return jsonify(result_cache.get_stats())
+
+@app.route('/objects/orb_profiles', methods=['GET'])
+def list_orb_profiles():
+    """Current ORB extraction profiles (register / identify / stream)"""
+    return jsonify(object_recognizer.orb_profiles.list_profiles())
+
+@app.route('/inference/profiles', methods=['GET'])
+def list_inference_profiles():
+    """Current per-endpoint inference profiles"""
+    return jsonify(inference_profiles.list_profiles())
+
+@app.route('/scene/rules', methods=['GET'])
+def list_scene_rules():
+    """Current scene rules (scene_rules.json)"""
+    return jsonify(scene_engine.list_rules())
+
+@app.route('/stream/stats', methods=['GET'])
+def stream_stats():
+    """Saved vs suppressed /stream frames, active tracks per client and latency budget use"""
+    stats = stream_tracker.get_stats()
+    stats["enabled"] = STREAM_TRACKING_ENABLED
+    stats["latency_budget"] = budget_stats.get_stats()
+    stats["scene"] = scene_engine.get_stats()
+    return jsonify(stats)
+
+@app.route('/logging/stats', methods=['GET'])
+def logging_stats():
+    """Async log queue depth and dropped record count"""
+    return jsonify(structured_logging.get_stats())
+
+@app.route('/inference/pool', methods=['GET'])
+def inference_pool_stats():
+    """Inference worker pool health (disabled when INFERENCE_WORKERS = 0)"""
+    if inference_pool is None:
+        return jsonify({"enabled": False})
+    stats = inference_pool.get_stats()
+    stats["enabled"] = True
+    return jsonify(stats)
+
+@app.route('/archive/stats', methods=['GET'])
+def archive_stats():
+    """Day pack archive statistics"""
+    return jsonify(capture_archive.get_stats())
+
+@app.route('/storage/stats', methods=['GET'])
+def storage_stats():
+    """Capture encoding policy, per-day bytes in/written, encode cost and disk footprint"""
+    stats = capture_storage.get_stats()
+    stats["archive"] = capture_archive.get_stats()
+    return jsonify(stats)
+
+@app.route('/profiles', methods=['GET'])
+def list_request_profiles():
+    """List saved request profiles (allow-listed clients only)"""
+    if not request_profiler.is_allowed(request.remote_addr):
+        abort(403)
+    profiles = request_profiler.list_profiles()
+    return jsonify({"profiles": profiles, "count": len(profiles)})
+
+@app.route('/profiles/<path:filename>', methods=['GET'])
+def download_request_profile(filename):
+    """Download a .prof file or its .txt summary (allow-listed clients only)"""
+    if not request_profiler.is_allowed(request.remote_addr):
+        abort(403)
+    return send_from_directory(PROFILES_FOLDER, filename, as_attachment=filename.endswith('.prof'))
+
 @app.route('/ping', methods=['GET'])
 def ping():
     """Simple heartbeat"""
@@ -562,12 +900,20 @@ def ping():
 
 @app.route('/uploads/<path:filename>')
 def serve_file(filename):
-    """Serve the image file"""
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    """Serve the image file (from uploads/ or from its day pack)"""
+    capture_storage.wait(filename)  # just saved, still being encoded
+    if os.path.exists(os.path.join(UPLOAD_FOLDER, filename)):
+        return send_from_directory(UPLOAD_FOLDER, filename)
+    
+    data = capture_archive.read(filename)
+    if data is None:
+        abort(404)
+    return Response(data, mimetype='image/jpeg')
 
 if __name__ == '__main__':
     print("Starting Streaming Server with Face Recognition and Object Recognition...")
     print(f"Registered persons: {[p['name'] for p in face_recognizer.get_registered_persons()]}")
     print(f"Registered objects: {object_recognizer.get_registered_names()}")
     # Listen on all interfaces
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # The debug reloader would start a second server process (and a second worker pool)
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=INFERENCE_WORKERS == 0)
@@ -0,0 +1,124 @@
+"""
+Structured Logging Module
+Non-blocking JSON-lines logging for the server's hot paths.
+
+Request threads only put the log record on a bounded queue; a
+QueueListener thread formats it as one JSON object per line and writes it
+to stdout (and optionally a file). When the queue is full the record is
+dropped and counted instead of blocking the request.
+
+Modules log through standard per-module loggers:
+    logger = logging.getLogger(__name__)
+    logger.info("Saved capture", extra={"fields": {"filename": name}})
+and guard costly debug messages with logger.isEnabledFor(logging.DEBUG).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; extra={"fields": {...}} is merged in"""
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: drops (and counts) records when full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+        self._count_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Only resolve the message here; JSON formatting runs on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            with self._count_lock:
+                self.enqueued += 1
+        except queue.Full:
+            with self._count_lock:
+                self.dropped += 1
+
+
+class _LoggingState:
+    handler = None
+    listener = None
+    level = None
+
+
+def setup_logging(level="INFO", log_file=None, queue_size=10000, module_levels=None,
+                  max_file_bytes=10 * 1024 * 1024, backup_count=5):
+    """
+    Route the root logger through the asynchronous JSON handler.
+    module_levels: {"object_recognition_module": "DEBUG", ...}
+    Safe to call more than once (later calls only change levels).
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    _LoggingState.level = logging.getLevelName(root.level)
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    if _LoggingState.handler is not None:
+        return _LoggingState.handler
+
+    formatter = JsonFormatter()
+    outputs = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        outputs.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_file_bytes, backupCount=backup_count, encoding="utf-8"))
+    for output in outputs:
+        output.setFormatter(formatter)
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    listener = logging.handlers.QueueListener(handler.queue, *outputs, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root.addHandler(handler)
+    _LoggingState.handler = handler
+    _LoggingState.listener = listener
+    return handler
+
+
+def get_stats():
+    """Queue depth and enqueued / dropped record counts"""
+    handler = _LoggingState.handler
+    if handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "level": _LoggingState.level,
+        "enqueued": handler.enqueued,
+        "dropped": handler.dropped,
+        "queue_depth": handler.queue.qsize(),
+        "queue_size": handler.queue.maxsize
+    }
@@ -0,0 +1,92 @@
+"""
+Stub Models Module
+Weight-free stand-in for the ultralytics YOLO model.
+Used when the server is started with SERVER_STUB_MODELS=1 (load tests, CI
+machines without yolov8n.pt). It exposes the parts of the YOLO API the server
+uses: model.names and model(source, **kwargs) -> results with .boxes.
+"""
+
+import hashlib
+import time
+
+import numpy as np
+
+# All 80 YOLO/COCO classes, in model.names order
+COCO_CLASSES = [
+    "person", "bicycle", "car", "motorcycle", "airplane",
+    "bus", "train", "truck", "boat", "traffic light",
+    "fire hydrant", "stop sign", "parking meter", "bench", "bird",
+    "cat", "dog", "horse", "sheep", "cow",
+    "elephant", "bear", "zebra", "giraffe", "backpack",
+    "umbrella", "handbag", "tie", "suitcase", "frisbee",
+    "skis", "snowboard", "sports ball", "kite", "baseball bat",
+    "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle",
+    "wine glass", "cup", "fork", "knife", "spoon",
+    "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut",
+    "cake", "chair", "couch", "potted plant", "bed",
+    "dining table", "toilet", "tv", "laptop", "mouse",
+    "remote", "keyboard", "cell phone", "microwave", "oven",
+    "toaster", "sink", "refrigerator", "book", "clock",
+    "vase", "scissors", "teddy bear", "hair drier", "toothbrush"
+]
+
+
+class _Tensorish:
+    """Minimal stand-in for a 1-row torch tensor (supports [0] and .tolist())"""
+    def __init__(self, values):
+        self._values = np.asarray(values, dtype=np.float32)
+
+    def __getitem__(self, idx):
+        return self._values[idx]
+
+    def tolist(self):
+        return self._values.tolist()
+
+
+class _StubBox:
+    def __init__(self, cls_id, conf, xyxyn):
+        self.cls = _Tensorish([cls_id])
+        self.conf = _Tensorish([conf])
+        self.xyxyn = _Tensorish([xyxyn])
+
+
+class _StubResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubYOLO:
+    def __init__(self, latency_ms=15):
+        self.names = {i: name for i, name in enumerate(COCO_CLASSES)}
+        # Simulated inference time so load tests still see realistic queueing
+        self.latency_ms = latency_ms
+
+    def __call__(self, source, conf=0.25, classes=None, max_det=300, **kwargs):
+        """
+        Return 0-3 deterministic pseudo-detections derived from the input,
+        honouring conf / classes / max_det like the real model.
+        """
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                seed_bytes = f.read(4096)
+        else:
+            seed_bytes = np.ascontiguousarray(source).tobytes()[:4096]
+        seed = int(hashlib.md5(seed_bytes).hexdigest()[:8], 16)
+        rng = np.random.default_rng(seed)
+
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+
+        candidates = classes if classes else list(self.names.keys())
+        boxes = []
+        for _ in range(rng.integers(0, 4)):
+            cls_id = int(candidates[rng.integers(0, len(candidates))])
+            score = float(rng.uniform(0.3, 0.95))
+            if score < conf:
+                continue
+            x1, y1 = rng.uniform(0.0, 0.6, size=2)
+            w, h = rng.uniform(0.1, 0.4, size=2)
+            boxes.append(_StubBox(cls_id, score, [x1, y1, min(1.0, x1 + w), min(1.0, y1 + h)]))
+
+        return [_StubResult(boxes[:max_det])]
@@ -0,0 +1,41 @@
+"""
+Regression tests for ObjectRecognizer's bag-of-visual-words prefilter.
+
+Run from this folder: python -m pytest -q
+"""
+
+import numpy as np
+
+from object_recognition_module import ObjectRecognizer
+
+
+def textured_image(seed):
+    """Random blocky texture (plenty of ORB corners, distinct per seed)"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    return np.kron(blocks, np.ones((10, 10, 1), dtype=np.uint8))
+
+
+def test_object_registered_during_sync_is_not_lost(tmp_path):
+    recognizer = ObjectRecognizer(data_dir=str(tmp_path / "objects"), prefilter_top_k=2)
+    for i in range(4):
+        assert recognizer.register_object(textured_image(i), f"o{i}")["success"]
+
+    new_image = textured_image(100)
+    original_sync = recognizer.vocabulary.sync
+
+    def sync_with_concurrent_register(descriptor_sets):
+        original_sync(descriptor_sets)
+        # Another request registers an object while the snapshot is indexed
+        if "late" not in recognizer.cached_descriptors:
+            recognizer.register_object(new_image, "late")
+
+    recognizer.vocabulary.sync = sync_with_concurrent_register
+    recognizer.identify_objects(textured_image(0))
+
+    # The vocabulary must not be marked current for a catalog it hasn't seen
+    assert recognizer._vocabulary_version != recognizer.version
+
+    result = recognizer.identify_objects(new_image)
+    assert "late" in [obj["name"] for obj in result["objects"]]
+    recognizer.store.close()
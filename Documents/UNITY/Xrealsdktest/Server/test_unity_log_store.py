@@ -0,0 +1,35 @@
+"""
+Tests for UnityLogStore query bounds.
+
+Run from this folder: python -m pytest -q
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from unity_log_store import UnityLogStore, format_ts, parse_ts
+
+
+@pytest.mark.parametrize("value", ["1e30", "-1e30", "inf", "nan", "not-a-date", "2024-13-01"])
+def test_parse_ts_rejects_bad_values_with_value_error(value):
+    with pytest.raises(ValueError):
+        parse_ts(value)
+
+
+def test_parse_ts_converts_offsets_to_local_time():
+    local = datetime(2024, 1, 1, 12, 0, 0)
+    aware = local.astimezone(timezone(timedelta(hours=5)))
+    assert parse_ts(aware.isoformat()) == format_ts(local)
+    assert parse_ts(str(local.timestamp())) == format_ts(local)
+    assert parse_ts("2024-01-01T12:00:00") == format_ts(local)
+
+
+def test_query_with_aware_bounds(tmp_path):
+    store = UnityLogStore(str(tmp_path / "logs"))
+    now = datetime.now()
+    store.append("Log", "hello", "", now=now)
+    start = parse_ts((now - timedelta(minutes=1)).astimezone(timezone.utc).isoformat())
+    end = parse_ts((now + timedelta(minutes=1)).astimezone(timezone.utc).isoformat())
+    assert [r["message"] for r in store.query(start=start, end=end)] == ["hello"]
+    store.close()
@@ -0,0 +1,398 @@
+"""
+Unity Log Store Module
+Segmented, compressed storage for the console logs posted to /log.
+
+Records are appended as JSON lines to an active segment
+(unity_YYYYMMDD_HHMMSS.jsonl). When it grows past segment_max_bytes or
+gets older than segment_max_seconds it is sealed and gzip-compressed in
+the background. index.json keeps per sealed segment its first/last
+timestamp and record count per log type, so a query only opens the
+segments that can contain matches and reads them line by line.
+
+Retention drops whole segments. A legacy unity_logs.txt (the old
+append-only file) can be imported once into segments.
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.json"
+SEGMENT_PREFIX = "unity_"
+
+# "[2024-01-01 12:00:00] [Error] message" lines of the old unity_logs.txt
+_LEGACY_LINE = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] \[([^\]]*)\] ?(.*)$")
+_LEGACY_STACK = "    Stack: "
+
+
+def format_ts(dt):
+    """Timestamp format of stored records (sorts lexicographically)"""
+    return dt.isoformat(timespec="milliseconds")
+
+
+def parse_ts(value):
+    """
+    Query bound -> stored timestamp format.
+    Accepts epoch seconds or ISO 8601 ('2024-01-01', '2024-01-01T12:00:00');
+    ISO values with an offset are converted to local time like the records.
+    Raises: ValueError (also for out-of-range values)
+    """
+    if value is None or value == "":
+        return None
+    try:
+        try:
+            dt = datetime.fromtimestamp(float(value))
+        except ValueError:
+            dt = datetime.fromisoformat(value)
+            if dt.tzinfo is not None:
+                dt = dt.astimezone().replace(tzinfo=None)
+    except (OverflowError, OSError):
+        raise ValueError(f"timestamp out of range: {value}")
+    return format_ts(dt)
+
+
+class UnityLogStore:
+    def __init__(self, log_dir, segment_max_bytes=4 * 1024 * 1024, segment_max_seconds=3600,
+                 stack_max_chars=200):
+        self.log_dir = log_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.stack_max_chars = stack_max_chars
+
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+
+        # Sealed segments, oldest first:
+        # {"name", "file", "start", "end", "count", "types": {type: count}}
+        self.segments = []
+        self._active = None
+        self._active_file = None
+        self._lock = threading.Lock()
+
+        self._load_index()
+
+    # ---------- index ----------
+
+    def _index_path(self):
+        return os.path.join(self.log_dir, INDEX_NAME)
+
+    def _load_index(self):
+        path = self._index_path()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.segments = json.load(f)
+            except (OSError, ValueError):
+                self.segments = []  # rebuilt from the segment files below
+
+        known = {s["name"] for s in self.segments}
+        for path in sorted(glob.glob(os.path.join(self.log_dir, SEGMENT_PREFIX + "*.jsonl*"))):
+            filename = os.path.basename(path)
+            name = filename.split(".", 1)[0]
+            if filename.endswith(".tmp"):
+                os.remove(path)  # interrupted compression, the .jsonl is still there
+                continue
+            if name in known:
+                continue
+            # Left open by a previous run (or index lost): seal it now
+            entry = self._scan_segment(path)
+            if entry["count"]:
+                self.segments.append(entry)
+                known.add(name)
+            else:
+                os.remove(path)
+
+        self.segments.sort(key=lambda s: s["name"])
+        self._write_index()
+
+        for entry in self.segments:
+            if not entry["file"].endswith(".gz"):
+                self._compress_async(entry)
+
+        if self.segments:
+            logger.info("Log segments loaded", extra={"fields": {"segments": len(self.segments)}})
+
+    def _scan_segment(self, path):
+        filename = os.path.basename(path)
+        entry = {"name": filename.split(".", 1)[0], "file": filename,
+                 "start": None, "end": None, "count": 0, "types": {}}
+        for record in self._read_records(path):
+            self._account(entry, record)
+        return entry
+
+    def _write_index(self):
+        """Atomically replace index.json (caller holds the lock or is the constructor)"""
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.segments, f, ensure_ascii=False)
+        os.replace(tmp, self._index_path())
+
+    @staticmethod
+    def _account(entry, record):
+        ts = record["ts"]
+        if entry["start"] is None or ts < entry["start"]:
+            entry["start"] = ts
+        if entry["end"] is None or ts > entry["end"]:
+            entry["end"] = ts
+        entry["count"] += 1
+        entry["types"][record["type"]] = entry["types"].get(record["type"], 0) + 1
+
+    # ---------- writing ----------
+
+    def _open_segment(self, now):
+        name = SEGMENT_PREFIX + now.strftime("%Y%m%d_%H%M%S_%f")
+        filename = name + ".jsonl"
+        self._active = {"name": name, "file": filename, "start": None, "end": None,
+                        "count": 0, "types": {}, "opened_at": time.time(), "bytes": 0}
+        self._active_file = open(os.path.join(self.log_dir, filename), 'a', encoding='utf-8')
+
+    def _seal_active(self):
+        """Close the active segment, index it and compress it (caller holds the lock)"""
+        if self._active is None:
+            return
+        self._active_file.close()
+        entry = {k: v for k, v in self._active.items() if k not in ("opened_at", "bytes")}
+        self._active = None
+        self._active_file = None
+        if not entry["count"]:
+            os.remove(os.path.join(self.log_dir, entry["file"]))
+            return
+        self.segments.append(entry)
+        self._write_index()
+        self._compress_async(entry)
+
+    def append(self, log_type, message, stack="", now=None):
+        """Store one Unity log record"""
+        now = now or datetime.now()
+        record = {"ts": format_ts(now), "type": log_type or "Log", "message": message or ""}
+        if stack:
+            record["stack"] = stack[:self.stack_max_chars]
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            if self._active is not None and (
+                    self._active["bytes"] >= self.segment_max_bytes
+                    or time.time() - self._active["opened_at"] >= self.segment_max_seconds):
+                self._seal_active()
+            if self._active is None:
+                self._open_segment(now)
+
+            self._active_file.write(line)
+            self._active_file.flush()  # visible to queries, survives a crash
+            self._active["bytes"] += len(line.encode('utf-8'))
+            self._account(self._active, record)
+
+    def rotate(self):
+        """Seal the active segment now"""
+        with self._lock:
+            self._seal_active()
+
+    def close(self):
+        self.rotate()
+
+    # ---------- compression ----------
+
+    def _compress_async(self, entry):
+        thread = threading.Thread(target=self._compress, args=(entry,), daemon=True)
+        thread.start()
+
+    def _compress(self, entry):
+        src = os.path.join(self.log_dir, entry["file"])
+        gz_name = entry["file"] + ".gz"
+        dst = os.path.join(self.log_dir, gz_name)
+        try:
+            with open(src, 'rb') as fin, gzip.open(dst + ".tmp", 'wb', compresslevel=6) as fout:
+                while True:
+                    chunk = fin.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    fout.write(chunk)
+            os.replace(dst + ".tmp", dst)
+        except OSError as e:
+            logger.warning("Segment compression failed", extra={"fields": {"file": entry["file"], "error": str(e)}})
+            return
+
+        with self._lock:
+            if entry not in self.segments:
+                os.remove(dst)  # dropped by retention meanwhile
+                return
+            entry["file"] = gz_name
+            self._write_index()
+        try:
+            os.remove(src)
+        except OSError:
+            pass  # still open by a query (Windows); dropped with the segment later
+
+    # ---------- reading ----------
+
+    @staticmethod
+    def _read_records(path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # torn line of an interrupted write
+
+    @staticmethod
+    def _read_lines(path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            yield from f
+
+    def _candidate_segments(self, start, end, types):
+        """Segments (sealed + active snapshot) whose index can match the filter"""
+        with self._lock:
+            entries = [dict(s, types=dict(s["types"])) for s in self.segments]
+            if self._active is not None and self._active["count"]:
+                entries.append(dict(self._active, types=dict(self._active["types"])))
+
+        for entry in entries:
+            if start is not None and entry["end"] < start:
+                continue
+            if end is not None and entry["start"] > end:
+                continue
+            if types and not any(t in entry["types"] for t in types):
+                continue
+            yield entry
+
+    def query(self, start=None, end=None, types=None, contains=None, limit=None):
+        """
+        Stream matching records, oldest first.
+        start / end: stored timestamp strings (see parse_ts), inclusive
+        types: iterable of log types; contains: substring of message or stack
+        """
+        types = set(types) if types else None
+        # A substring without JSON-escaped characters can reject lines before parsing
+        raw_filter = contains if contains and json.dumps(contains, ensure_ascii=False)[1:-1] == contains else None
+        returned = 0
+
+        for entry in self._candidate_segments(start, end, types):
+            path = os.path.join(self.log_dir, entry["file"])
+            if not os.path.exists(path):
+                # Compressed (or dropped) since the snapshot
+                path = path + ".gz"
+                if not os.path.exists(path):
+                    continue
+
+            for line in self._read_lines(path):
+                if raw_filter is not None and raw_filter not in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                ts = record["ts"]
+                if start is not None and ts < start:
+                    continue
+                if end is not None and ts > end:
+                    continue
+                if types and record["type"] not in types:
+                    continue
+                if contains and contains not in record["message"] and contains not in record.get("stack", ""):
+                    continue
+
+                yield record
+                returned += 1
+                if limit is not None and returned >= limit:
+                    return
+
+    # ---------- maintenance ----------
+
+    def drop_old_segments(self, max_age_days):
+        """
+        Delete sealed segments whose newest record is older than max_age_days.
+        Returns: names of dropped segments
+        """
+        cutoff = format_ts(datetime.now() - timedelta(days=max_age_days))
+        dropped = []
+        with self._lock:
+            keep = []
+            for entry in self.segments:
+                if entry["end"] < cutoff:
+                    dropped.append(entry)
+                else:
+                    keep.append(entry)
+            if not dropped:
+                return []
+            self.segments = keep
+            self._write_index()
+
+        for entry in dropped:
+            base = os.path.join(self.log_dir, entry["name"] + ".jsonl")
+            for path in (base, base + ".gz"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return [entry["name"] for entry in dropped]
+
+    def import_legacy(self, path):
+        """
+        Import the old append-only unity_logs.txt and rename it to *.imported.
+        Returns: number of imported records
+        """
+        if not os.path.exists(path):
+            return 0
+
+        imported = 0
+        record = None
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.startswith(_LEGACY_STACK) and record is not None:
+                    record[3] = line[len(_LEGACY_STACK):]
+                    continue
+                match = _LEGACY_LINE.match(line)
+                if match is None:
+                    continue  # continuation of a multi-line message
+                if record is not None:
+                    self.append(record[1], record[2], record[3], now=record[0])
+                    imported += 1
+                ts = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+                record = [ts, match.group(2), match.group(3), ""]
+        if record is not None:
+            self.append(record[1], record[2], record[3], now=record[0])
+            imported += 1
+
+        self.rotate()
+        os.replace(path, path + ".imported")
+        logger.info("Imported legacy log", extra={"fields": {"file": os.path.basename(path), "records": imported}})
+        return imported
+
+    def get_stats(self):
+        with self._lock:
+            sealed = list(self.segments)
+            active = dict(self._active) if self._active is not None else None
+
+        stored_bytes = 0
+        for entry in sealed:
+            try:
+                stored_bytes += os.path.getsize(os.path.join(self.log_dir, entry["file"]))
+            except OSError:
+                pass
+
+        types = {}
+        for entry in sealed + ([active] if active else []):
+            for t, n in entry["types"].items():
+                types[t] = types.get(t, 0) + n
+
+        return {
+            "segments": len(sealed),
+            "compressed_segments": sum(1 for s in sealed if s["file"].endswith(".gz")),
+            "stored_bytes": stored_bytes,
+            "active_segment": active["file"] if active else None,
+            "active_bytes": active["bytes"] if active else 0,
+            "records": sum(s["count"] for s in sealed) + (active["count"] if active else 0),
+            "types": types,
+            "oldest": sealed[0]["start"] if sealed else (active["start"] if active else None)
+        }
@@ -0,0 +1,171 @@
+"""
+Visual Vocabulary Module
+Binary bag-of-visual-words prefilter for ORB descriptors.
+
+A small vocabulary of binary "words" is clustered from the registered
+descriptors (k-majority: Hamming assignment + per-bit majority vote).
+Each registered object gets a TF-IDF word histogram, and a frame is scored
+against all objects with a single matrix product. ObjectRecognizer then runs
+the full ratio-test matching only on the top-K candidates.
+"""
+
+import threading
+
+import numpy as np
+
+
+def hamming_to_centers(descriptors, centers, block_size=4096):
+    """
+    Hamming distance from every descriptor to every center.
+    descriptors: (N, 32) uint8, centers: (K, 32) uint8
+    Returns: (N, K) float32 distance matrix
+
+    Uses |a| + |b| - 2 a.b on unpacked bits, which turns the whole
+    computation into a BLAS matrix product (exact for 256-bit descriptors).
+    """
+    center_bits = np.unpackbits(centers, axis=1).astype(np.float32)
+    center_ones = center_bits.sum(axis=1)
+
+    distances = np.empty((len(descriptors), len(centers)), dtype=np.float32)
+    for start in range(0, len(descriptors), block_size):
+        bits = np.unpackbits(descriptors[start:start + block_size], axis=1).astype(np.float32)
+        distances[start:start + block_size] = (
+            bits.sum(axis=1)[:, None] + center_ones[None, :] - 2.0 * (bits @ center_bits.T)
+        )
+    return distances
+
+
+class VisualVocabulary:
+    def __init__(self, num_words=256, iterations=5,
+                 max_training_descriptors=20000, max_descriptors_per_object=5000, seed=0):
+        self.num_words = num_words
+        self.iterations = iterations
+        self.max_training_descriptors = max_training_descriptors
+        self.max_descriptors_per_object = max_descriptors_per_object
+        self.rng = np.random.default_rng(seed)
+
+        # (K, 32) uint8 word centers, None until built
+        self.words = None
+        # Object count at the time the words were clustered
+        self.built_for_objects = 0
+
+        # name -> (descriptor bank the counts were computed from, raw word counts).
+        # Banks are replaced, never modified in place, so identity tells whether an
+        # object changed (its size alone does not: re-registration and the
+        # 30000-descriptor cap keep it constant)
+        self._object_counts = {}
+        # Cached scoring matrix (rebuilt when histograms change)
+        self._names = []
+        self._matrix = None
+        self._idf = None
+
+        self._lock = threading.Lock()
+
+    def _subsample(self, descriptors, limit):
+        """Evenly spaced subset so large banks don't dominate the cost"""
+        if len(descriptors) <= limit:
+            return descriptors
+        idx = np.linspace(0, len(descriptors) - 1, limit).astype(np.int64)
+        return descriptors[idx]
+
+    def _cluster(self, descriptor_sets):
+        """k-majority clustering over a sample of all registered descriptors"""
+        per_object = max(1, self.max_training_descriptors // max(1, len(descriptor_sets)))
+        sample = np.vstack([self._subsample(d, per_object) for d in descriptor_sets.values()])
+
+        num_words = min(self.num_words, len(sample))
+        init_idx = self.rng.choice(len(sample), size=num_words, replace=False)
+        words = sample[init_idx].copy()
+        sample_bits = np.unpackbits(sample, axis=1).astype(np.float32)
+
+        for _ in range(self.iterations):
+            assignment = hamming_to_centers(sample, words).argmin(axis=1)
+
+            # Per-cluster bit counts via one-hot matrix product
+            one_hot = np.zeros((num_words, len(sample)), dtype=np.float32)
+            one_hot[assignment, np.arange(len(sample))] = 1.0
+            bit_counts = one_hot @ sample_bits
+            members = one_hot.sum(axis=1)
+
+            majority = (bit_counts * 2 >= members[:, None]).astype(np.uint8)
+            non_empty = members > 0  # keep the old center for empty clusters
+            words[non_empty] = np.packbits(majority[non_empty], axis=1)
+
+        self.words = words
+        self.built_for_objects = len(descriptor_sets)
+        self._object_counts = {}
+
+    def quantize(self, descriptors):
+        """Map descriptors to their nearest word ids"""
+        return hamming_to_centers(descriptors, self.words).argmin(axis=1)
+
+    def _word_counts(self, descriptors):
+        descriptors = self._subsample(descriptors, self.max_descriptors_per_object)
+        return np.bincount(self.quantize(descriptors), minlength=len(self.words)).astype(np.float32)
+
+    def sync(self, descriptor_sets):
+        """
+        Bring the vocabulary and per-object histograms up to date with the
+        current catalog. Words are re-clustered only when the catalog has
+        grown or shrunk by 2x since the last build; histograms are recomputed
+        only for objects whose descriptor bank changed.
+        """
+        with self._lock:
+            count = len(descriptor_sets)
+            if count == 0:
+                self._names, self._matrix = [], None
+                return
+
+            if (self.words is None
+                    or count > self.built_for_objects * 2
+                    or count * 2 < self.built_for_objects):
+                self._cluster(descriptor_sets)
+
+            changed = False
+            for name in list(self._object_counts.keys()):
+                if name not in descriptor_sets:
+                    del self._object_counts[name]
+                    changed = True
+
+            for name, desc in descriptor_sets.items():
+                cached = self._object_counts.get(name)
+                if cached is None or cached[0] is not desc:
+                    self._object_counts[name] = (desc, self._word_counts(desc))
+                    changed = True
+
+            if changed or self._matrix is None:
+                self._rebuild_matrix()
+
+    def _rebuild_matrix(self):
+        """TF-IDF weight and L2-normalise every object histogram"""
+        self._names = list(self._object_counts.keys())
+        counts = np.vstack([self._object_counts[n][1] for n in self._names])
+
+        doc_freq = (counts > 0).sum(axis=0)
+        self._idf = np.log((1.0 + len(self._names)) / (1.0 + doc_freq)).astype(np.float32) + 1.0
+
+        tf = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1.0)
+        weighted = tf * self._idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        self._matrix = weighted / np.maximum(norms, 1e-12)
+
+    def score(self, descriptors):
+        """
+        Score a frame against every object.
+        Returns: list of (name, similarity) sorted best first
+        """
+        with self._lock:
+            if self._matrix is None or self.words is None:
+                return []
+
+            counts = np.bincount(self.quantize(descriptors), minlength=len(self.words)).astype(np.float32)
+            query = (counts / max(counts.sum(), 1.0)) * self._idf
+            query /= max(np.linalg.norm(query), 1e-12)
+
+            similarities = self._matrix @ query
+            order = np.argsort(-similarities)
+            return [(self._names[i], float(similarities[i])) for i in order]
+
+    def top_candidates(self, descriptors, k):
+        """Names of the k objects most likely to be in the frame"""
+        return [name for name, _ in self.score(descriptors)[:k]]